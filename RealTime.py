@@ -1,6 +1,12 @@
-from googlesearch import search
 from groq import Groq # Importing the Groq library to use its API.
-from json import load, dump # Importing functions to read and write JSON files.
+import asyncio # Importing asyncio to run the blocking search off the event loop.
+from concurrent.futures import Future, ThreadPoolExecutor # Importing a thread pool to run searches alongside the rest of retrieval.
+from llm_clients import llm_clients # Importing the shared async clients with pooled connections.
+from prompt_budget import PromptBudget, Section, prompt_metrics, truncate_tokens # Importing the token budgeting for prompts.
+from conversation_store import ConversationStore # Importing the append-only conversation log.
+from conversation_context import ConversationContext # Importing the bounded history with a rolling summary.
+from search_cache import SearchCache # Importing the cache for web search results.
+import re # Importing re to find sentence ends in streamed answers.
 import datetime # Importing the datetime module for real-time date and time information.
 from dotenv import dotenv_values # Importing dotekv_values to read environment variables from a . env file.
 # Load environment variables from the .env file.
@@ -9,23 +15,69 @@ env_vars = dotenv_values(".env")
 Username = env_vars. get("Username" )
 Assistantname = env_vars. get( "Assistantname")
 GroqAPIKey = env_vars.get( "GroqAPIKey")
+# Token budgets for the answer prompt: the whole prompt, the search results and the chat history.
+AnswerPromptBudget = int(env_vars.get("AnswerPromptBudget") or 6000)
+SearchResultsBudget = int(env_vars.get("SearchResultsBudget") or 1000)
+ChatHistoryBudget = int(env_vars.get("ChatHistoryBudget") or 2000)
+# Conversation log file; the old ChatLog JSON array is imported into it the first time.
+ConversationLogPath = env_vars.get("ConversationLogPath", "ChatLog.jsonl")
+# Recent turns sent verbatim; older turns are folded into a rolling summary of at most SummaryBudget tokens.
+ContextTurns = int(env_vars.get("ContextTurns") or 6)
+SummaryBudget = int(env_vars.get("SummaryBudget") or 400)
+ConversationSummaryPath = env_vars.get("ConversationSummaryPath", "ChatSummary.json")
+# Number of web searches kept in the search cache.
+SearchCacheSize = int(env_vars.get("SearchCacheSize") or 256)
 # Initialize the Groq client with the provided API key.
 client = Groq(api_key=GroqAPIKey)
 # Define the system instructions for the chatbot.
 System = f"""Hello, I am {Username}, You are a very accurate and advanced AI chatbot named {Assistantname} which has real-time up-to-date information from the internet.
 *** Provide Answers In a Professional Way, make sure to add full stops, commas, question marks, and use proper grammar.***
 *** Just answer the question from the provided data in a professional way. ***"""
-# Try to load the chat log from a JSON file, or create an empty one if it doesn't exist.
-try:
-    with open(r".\ChatLog.json", "r") as f:
-        messages = load(f)
-except :
-    with open(r".\ChatLog. json", "w") as f:
-        dump([], f)
+# Open the append-only chat log, importing the old JSON chat log if this is the first run.
+conversation_store = ConversationStore(
+    ConversationLogPath,
+    legacy_paths=["ChatLog. json", "ChatLog.json", r".\ChatLog. json", r".\ChatLog.json"]
+)
+# Function to fold messages that have aged out of the verbatim window into the running summary.
+# Uses the smaller, faster model; it runs in the background and never delays an answer.
+def SummarizeConversation(summary, messages):
+    assembled = summary_budget.assemble([
+    Section("instructions", SummaryInstructions, priority=3),
+    Section("summary", summary, priority=2, trim="tail"),
+    Section("conversation", messages, priority=1, trim="oldest"),
+    ])
+    conversation = "\n".join(f"{m['role']}: {m['content']}" for m in assembled["conversation"])
+    completion = client.chat.completions.create(
+    model="llama3-8b-8192",
+    messages=[
+    {"role": "system", "content": assembled["instructions"]},
+    {"role": "user", "content": f"Summary so far:\n{assembled['summary'] or '(none)'}\n\nNew messages:\n{conversation}"}
+    ],
+    temperature=0.3,
+    max_tokens=SummaryBudget,
+    top_p=1,
+    stream=False
+    )
+    Summary = completion.choices[0].message.content or ""
+# Record the prompt and completion sizes.
+    assembled.finish(Summary)
+    return truncate_tokens(Summary.strip(), SummaryBudget)
+# Instructions for the summarizer.
+SummaryInstructions = f"""You maintain a running summary of a conversation between {Username} and {Assistantname}.
+Update the summary so far with the new messages. Keep names, facts, preferences and open questions; drop small talk.
+Reply with the updated summary only, in at most {SummaryBudget} tokens."""
+# Token budget for summary prompts: the previous summary plus a batch of aged-out messages.
+summary_budget = PromptBudget("summary", SummaryBudget * 2 + ChatHistoryBudget, metrics=prompt_metrics)
+# Bounded chat history: the last ContextTurns turns verbatim plus the rolling summary of everything older.
+conversation_context = ConversationContext(
+    conversation_store, SummarizeConversation, keep_turns=ContextTurns, path=ConversationSummaryPath
+)
+# Cache of web search results; repeated queries within their TTL skip the network.
+search_cache = SearchCache(max_entries=SearchCacheSize)
 # Function to perform a Google search and format the results.
 # Function to perform a Google search and format the results.
-def GoogleSearch(query):
-    results = list(search(query, advanced=True, num_results=5))
+def GoogleSearch(query, category=None):
+    results = search_cache.search(query, category=category, num_results=5)
     Answer = f"The search results for '{query}' are: \n[start]\n"
     for i in results:
         Answer += f"Title: {i.title}\nDescription: {i.description}\n\n"
@@ -62,19 +114,92 @@ def Information():
     data += f"Time: {hour} hours, {minute} minutes, {second} seconds. \n"
     return data
 
+# Categories whose answers need fresh search results; general queries are answered from the chat history alone.
+SEARCH_CATEGORIES = {"realtime", "google search", "youtube search"}
+# Thread pool that runs web searches while the rest of the prompt is retrieved.
+retrieval_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieval")
+# Function to decide whether a query needs a web search; an unknown category is searched to be safe.
+def NeedsSearch(category):
+    return category is None or category in SEARCH_CATEGORIES
+# Function to start the web search for a query early, e.g. as soon as it is classified.
+# Returns a Future of the search results, or None when the query doesn't need a search.
+def PrefetchContext(prompt, category=None):
+    if not NeedsSearch(category):
+        return None
+    return retrieval_pool.submit(GoogleSearch, prompt, category)
+# Function to retrieve everything the answer prompt needs: the search runs in the pool while the
+# bounded chat history, its summary and real-time information are gathered. A prefetched context (search results text or
+# a Future from PrefetchContext) is used instead of searching again.
+def RetrieveContext(prompt, category=None, context=None):
+    if context is None:
+        context = PrefetchContext(prompt, category)
+    summary, messages = conversation_context.history()
+    messages.append({"role": "user", "content": f"{prompt}"})
+    information = Information()
+    results = context.result() if isinstance(context, Future) else (context or "")
+    return messages, results, information, summary
+# Coroutine version of RetrieveContext; waits for the search without blocking the event loop.
+async def RetrieveContextAsync(prompt, category=None, context=None):
+    if context is None:
+        context = PrefetchContext(prompt, category)
+    summary, messages = conversation_context.history()
+    messages.append({"role": "user", "content": f"{prompt}"})
+    information = Information()
+    results = await asyncio.wrap_future(context) if isinstance(context, Future) else (context or "")
+    return messages, results, information, summary
+
+# Token budget for answer prompts; old chat history goes first, then the tail of the search results.
+answer_budget = PromptBudget(
+    "answer", AnswerPromptBudget,
+    {"search": SearchResultsBudget, "history": ChatHistoryBudget},
+    metrics=prompt_metrics
+)
+# Function to assemble the answer prompt within its token budget.
+def AnswerPrompt(messages, results, information=None, summary=""):
+    return answer_budget.assemble([
+    Section("system", SystemChatBot, priority=3),
+    Section("search", results, priority=1, trim="tail"),
+    Section("information", information or Information(), priority=3),
+    Section("summary", summary, priority=2, trim="tail"),
+    Section("history", messages[:-1], priority=0, trim="oldest"),
+    Section("question", messages[-1:], priority=3),
+    ])
+# Function to turn an assembled answer prompt into the message list for Groq.
+# Queries answered without a search get no search results message, and a new conversation no summary.
+def AnswerMessages(assembled):
+    search = [ {"role": "system", "content": assembled["search"]} ] if assembled["search"] else []
+    summary = [ {"role": "system", "content": f"Summary of the earlier conversation:\n{assembled['summary']}"} ] if assembled["summary"] else []
+    return (assembled["system"]
+    + search + [ {"role": "system", "content": assembled["information"]} ]
+    + summary + assembled["history"] + assembled["question"])
 # Function to handle real-time search and response generation.
-def RealtimeSearchEngine(prompt):
-    global SystemChatBot, messages
-# Load the chat log from the JSON file.
-    with open(r".\ChatLog. json", "r") as f:
-        messages = load(f)
-        messages. append( {"role": "user", "content": f"{prompt}"})
-# Add Google search results to the system chatbot messages.
-    SystemChatBot.append({"role": "system", "content": GoogleSearch(prompt)})
+# Sentence ends: ., ! or ? (optionally closed by a quote or bracket) followed by whitespace.
+SENTENCE_END = re.compile(r"""[.!?]+["')\]]*\s+""")
+# Abbreviations whose full stop doesn't end a sentence.
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "etc", "e.g", "i.e", "no"}
+# Function to split complete sentences off streamed text, e.g. so speech can start at the first one.
+# Returns the complete sentences and the unfinished rest; very short pieces wait for more text.
+def SplitSentences(text, min_length=12):
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentence = text[start:match.end()].strip()
+        last_word = sentence.split()[-1].rstrip(".").lower() if sentence else ""
+        if len(sentence) >= min_length and last_word not in ABBREVIATIONS:
+            sentences.append(sentence)
+            start = match.end()
+    return sentences, text[start:]
+# Function to stream an answer, yielding the text chunks as Groq generates them.
+# The category decides whether a web search is needed; context is an optional prefetched context.
+def RealtimeSearchEngineStream(prompt, category=None, context=None):
+# Retrieve the search results, bounded chat history with its summary and real-time information concurrently.
+    messages, results, information, summary = RetrieveContext(prompt, category, context)
+# Assemble them within the token budget.
+    assembled = AnswerPrompt(messages, results, information, summary)
 # Generate a response using the Groq client.
     completion = client.chat.completions.create(
     model="llama3-70b-8192",
-    messages=SystemChatBot + [ {"role": "system", "content": Information() } ] + messages,
+    messages=AnswerMessages(assembled),
     temperature=0.7,
     max_tokens=2048,
     top_p=1,
@@ -82,18 +207,53 @@ def RealtimeSearchEngine(prompt):
     stop=None
     )
     Answer = ""
-#Concatenate response chunks from the streaming output
-    for chunk in completion:
-        if chunk.choices[0].delta.content:
-            Answer += chunk. choices[0].delta.content
-# Clean up the response.
-    Answer = Answer. strip( ). replace("</s>", "")
-    messages. append( {"role": "assistant", "content": Answer} )
-# Save the updated chat log back to the JSON file.
-    with open(r".\ChatLog. json","w") as f:
-        dump(messages, f, indent=4)
-# Remove the most recent system message from the chatbot conversation.
-    SystemChatBot . pop()
+    try:
+# Hand each response chunk to the caller as soon as it arrives.
+        for chunk in completion:
+            if chunk.choices[0].delta.content:
+                text = chunk.choices[0].delta.content.replace("</s>", "")
+                Answer += text
+                yield text
+    finally:
+# Record the prompt and completion sizes, also when the caller stopped early.
+        assembled.finish(Answer)
+# Append the question and the complete answer to the chat log, then fold old turns into the summary in the background.
+    conversation_store.append_turn(prompt, Answer.strip())
+    conversation_context.update()
+# Function to handle real-time search and response generation.
+def RealtimeSearchEngine(prompt, category=None, context=None):
+# Concatenate the streamed response chunks and clean up the response.
+    Answer = "".join(RealtimeSearchEngineStream(prompt, category, context)).strip()
+    return AnswerModifier(Answer=Answer)
+# Async generator version of RealtimeSearchEngineStream, using the shared async Groq client.
+async def RealtimeSearchEngineStreamAsync(prompt, category=None, context=None):
+# Retrieve the context; the blocking search runs in the retrieval pool so the event loop stays free.
+    messages, results, information, summary = await RetrieveContextAsync(prompt, category, context)
+# Assemble the prompt within the token budget.
+    assembled = AnswerPrompt(messages, results, information, summary)
+    Answer = ""
+    try:
+        async for text in llm_clients.groq_chat_stream(
+        model="llama3-70b-8192",
+        messages=AnswerMessages(assembled),
+        temperature=0.7,
+        max_tokens=2048,
+        top_p=1,
+        stop=None
+        ):
+            text = text.replace("</s>", "")
+            Answer += text
+            yield text
+    finally:
+# Record the prompt and completion sizes.
+        assembled.finish(Answer)
+# Append the question and answer to the chat log off the event loop; the write is fsynced.
+    await asyncio.to_thread(conversation_store.append_turn, prompt, Answer.strip())
+# Fold old turns into the summary in the background.
+    conversation_context.update()
+# Coroutine version of RealtimeSearchEngine.
+async def RealtimeSearchEngineAsync(prompt, category=None, context=None):
+    Answer = "".join([text async for text in RealtimeSearchEngineStreamAsync(prompt, category, context)]).strip()
     return AnswerModifier(Answer=Answer)
 # Main entry point of the program for interactive querying.
 if __name__ == "__main__":
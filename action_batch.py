@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import math
+import logging
+
+from text_input import escape_input_text
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+STEP_PATTERN = re.compile(r'__STEP_(\d+)__:(-?\d+)')
+
+# Integer fields of each action; text and sleep are checked on their own
+INT_FIELDS = {
+    'tap': ('x', 'y'),
+    'key': ('key_code',),
+    'swipe': ('x1', 'y1', 'x2', 'y2', 'duration_ms'),
+}
+
+
+def _int_field(step, field):
+    value = step.get(field)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{step.get('action')} step needs an integer {field}, got {value!r}") from None
+
+
+class ActionBatch:
+    """
+    A sequence of primitive device actions compiled into one shell script.
+
+    Steps are added with the chainable tap/key/text/swipe/sleep methods. The
+    compiled script prints a status marker after every step, so a single
+    shell invocation reports the exit code of each action.
+    """
+
+    def __init__(self, name=None, steps=None):
+        self.name = name
+        self.steps = list(steps or [])
+
+    def __len__(self):
+        return len(self.steps)
+
+    def tap(self, x, y):
+        self.steps.append({'action': 'tap', 'x': int(x), 'y': int(y)})
+        return self
+
+    def key(self, key_code):
+        self.steps.append({'action': 'key', 'key_code': int(key_code)})
+        return self
+
+    def text(self, text):
+        self.steps.append({'action': 'text', 'text': str(text)})
+        return self
+
+    def swipe(self, x1, y1, x2, y2, duration_ms=300):
+        self.steps.append({
+            'action': 'swipe', 'x1': int(x1), 'y1': int(y1),
+            'x2': int(x2), 'y2': int(y2), 'duration_ms': int(duration_ms)
+        })
+        return self
+
+    def sleep(self, seconds):
+        """Pause on the device, without a round trip to the host."""
+        self.steps.append({'action': 'sleep', 'seconds': float(seconds)})
+        return self
+
+    @property
+    def total_sleep(self):
+        return sum(step['seconds'] for step in self.steps if step['action'] == 'sleep')
+
+    @staticmethod
+    def validate_step(step):
+        """
+        Check a step, e.g. one loaded from a macro file, before it goes
+        anywhere near a shell.
+
+        :return: A clean copy of the step with only its known fields
+        :raises ValueError: If the action is unknown or a field is invalid
+        """
+        if not isinstance(step, dict):
+            raise ValueError(f"Batch step must be an object, got {step!r}")
+        action = step.get('action')
+        if action in INT_FIELDS:
+            return {'action': action, **{field: _int_field(step, field) for field in INT_FIELDS[action]}}
+        if action == 'text':
+            if not isinstance(step.get('text'), str):
+                raise ValueError(f"text step needs a string, got {step.get('text')!r}")
+            return {'action': action, 'text': step['text']}
+        if action == 'sleep':
+            seconds = step.get('seconds')
+            try:
+                seconds = float(seconds)
+            except (TypeError, ValueError):
+                seconds = None
+            if seconds is None or not math.isfinite(seconds) or seconds < 0:
+                raise ValueError(f"sleep step needs a non-negative number of seconds, got {step.get('seconds')!r}")
+            return {'action': action, 'seconds': seconds}
+        raise ValueError(f"Unknown batch action: {action!r}")
+
+    @staticmethod
+    def step_command(step):
+        """
+        Build the shell command for a single step. Numbers are formatted from
+        validated ints and text only goes in through escape_input_text.
+        """
+        step = ActionBatch.validate_step(step)
+        action = step['action']
+        if action == 'tap':
+            return f"input tap {step['x']} {step['y']}"
+        if action == 'key':
+            return f"input keyevent {step['key_code']}"
+        if action == 'text':
+            return f"input text {escape_input_text(step['text'])}"
+        if action == 'swipe':
+            return f"input swipe {step['x1']} {step['y1']} {step['x2']} {step['y2']} {step['duration_ms']}"
+        if action == 'sleep':
+            return f"sleep {step['seconds']:g}"
+
+    def to_script(self, stop_on_error=True):
+        """
+        Compile the batch into a shell script.
+
+        :param stop_on_error: Skip the remaining steps after a failing one
+        :return: Script text
+        """
+        lines = ["_batch_ok=1"]
+        for index, step in enumerate(self.steps):
+            command = self.step_command(step)
+            body = f"{command}; _s=$?; echo \"__STEP_{index}__:$_s\""
+            if stop_on_error:
+                body += "; [ $_s = 0 ] || _batch_ok=0"
+            lines.append(f"if [ $_batch_ok = 1 ]; then {body}; fi")
+        return "\n".join(lines)
+
+    def parse_results(self, output):
+        """
+        Match the status markers in the script output back to the steps.
+
+        :return: List of dicts with the step and its returncode (None if skipped)
+        """
+        codes = {int(index): int(code) for index, code in STEP_PATTERN.findall(output)}
+        return [
+            dict(step, returncode=codes.get(index))
+            for index, step in enumerate(self.steps)
+        ]
+
+    def to_dict(self):
+        return {'name': self.name, 'steps': self.steps}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a batch from its dict form, rejecting it whole if any step is
+        invalid.
+
+        :raises ValueError: If the data or any of its steps is invalid
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('steps', []), list):
+            raise ValueError("Macro must be an object with a list of steps")
+        steps = []
+        for index, step in enumerate(data.get('steps', [])):
+            try:
+                steps.append(cls.validate_step(step))
+            except ValueError as e:
+                raise ValueError(f"Invalid step {index}: {e}") from None
+        return cls(data.get('name'), steps)
+
+    def save(self, path):
+        """Save the batch as a JSON macro file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=4)
+        logger.info(f"Saved macro '{self.name}' with {len(self.steps)} steps to {path}")
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a batch from a JSON macro file.
+
+        :raises ValueError: If the file is not valid JSON or has an invalid step
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,265 @@
+import subprocess
+import threading
+import queue
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+
+class AdbShellError(Exception):
+    """Raised when a persistent ADB shell session fails or times out."""
+
+
+class AdbShellTimeout(AdbShellError):
+    """Raised when a command does not finish within its timeout."""
+
+
+class AdbShellSession:
+    """
+    A long-lived `adb shell` process that commands are written into.
+    Every command is followed by an `echo` of a unique sentinel and the exit
+    status, so the output of one command can be read back without spawning
+    a new adb process per action.
+    """
+
+    def __init__(self, adb_path, serial=None, timeout=10.0):
+        self.adb_path = adb_path
+        self.serial = serial
+        self.timeout = timeout
+        self.process = None
+        self.output_queue = queue.Queue()
+        self.reader_thread = None
+        self.last_used = 0.0
+
+    def start(self):
+        """
+        Start the underlying `adb shell` process and its output reader thread.
+        """
+        cmd = [self.adb_path]
+        if self.serial:
+            cmd += ['-s', self.serial]
+        cmd.append('shell')
+        logger.info(f"Starting persistent shell: {' '.join(cmd)}")
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1
+        )
+        self.output_queue = queue.Queue()
+        self.reader_thread = threading.Thread(target=self._read_output, daemon=True)
+        self.reader_thread.start()
+        self.last_used = time.monotonic()
+
+    def _read_output(self):
+        """Forward shell output lines into the queue until the process exits."""
+        process = self.process
+        try:
+            for line in process.stdout:
+                self.output_queue.put(line)
+        except Exception as e:
+            logger.debug(f"Shell reader stopped: {e}")
+        finally:
+            self.output_queue.put(None)  # Signal end of stream
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, command, timeout=None):
+        """
+        Run a shell command in the session.
+
+        :param command: Command line to execute on the device
+        :param timeout: Seconds to wait for the sentinel (defaults to session timeout)
+        :return: (returncode, output) tuple
+        """
+        if not self.is_alive():
+            raise AdbShellError("Shell session is not running")
+
+        timeout = timeout or self.timeout
+        sentinel = f"__ADB_DONE_{uuid.uuid4().hex}__"
+        # Group the command so multi-statement lines share one redirect, and
+        # detach it from our stdin so it cannot swallow the following lines.
+        script = f"{{ {command}\n}} </dev/null 2>&1; echo \"{sentinel}:$?\"\n"
+        try:
+            self.process.stdin.write(script)
+            self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise AdbShellError(f"Failed to write to shell: {e}")
+
+        output = []
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # The session is now out of sync with its output; discard it.
+                self.close()
+                raise AdbShellTimeout(f"Timed out after {timeout}s waiting for: {command}")
+            try:
+                line = self.output_queue.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                self.close()
+                raise AdbShellError("Shell session exited unexpectedly")
+
+            index = line.find(sentinel)
+            if index == -1:
+                output.append(line)
+                continue
+
+            # Output without a trailing newline shares the line with the sentinel
+            output.append(line[:index])
+            status = line[index + len(sentinel) + 1:].strip()
+            self.last_used = time.monotonic()
+            try:
+                returncode = int(status)
+            except ValueError:
+                returncode = -1
+            return returncode, "".join(output)
+
+    def health_check(self):
+        """
+        Check that the session still answers commands.
+
+        :return: True if healthy, False otherwise
+        """
+        try:
+            returncode, output = self.run("echo ok", timeout=2)
+            return returncode == 0 and output.strip() == "ok"
+        except AdbShellError:
+            return False
+
+    def close(self):
+        """Terminate the shell process."""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except Exception:
+            pass
+        try:
+            process.terminate()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+
+
+class AdbShellPool:
+    """
+    Pool of persistent shell sessions, keyed by device serial.
+    Idle sessions are health-checked before reuse and dead ones are
+    replaced transparently.
+    """
+
+    def __init__(self, adb_path, max_sessions_per_device=2, idle_check_after=30.0, timeout=10.0):
+        self.adb_path = adb_path
+        self.max_sessions_per_device = max_sessions_per_device
+        self.idle_check_after = idle_check_after
+        self.timeout = timeout
+        self.idle_sessions = {}   # serial -> list of idle sessions
+        self.session_counts = {}  # serial -> number of open sessions
+        self.condition = threading.Condition()
+
+    def _acquire(self, serial):
+        with self.condition:
+            while True:
+                idle = self.idle_sessions.setdefault(serial, [])
+                if idle:
+                    session = idle.pop()
+                    break
+                if self.session_counts.get(serial, 0) < self.max_sessions_per_device:
+                    self.session_counts[serial] = self.session_counts.get(serial, 0) + 1
+                    session = None
+                    break
+                self.condition.wait()
+
+        try:
+            if session is None:
+                session = AdbShellSession(self.adb_path, serial, self.timeout)
+                session.start()
+            elif not session.is_alive() or (
+                time.monotonic() - session.last_used > self.idle_check_after
+                and not session.health_check()
+            ):
+                logger.info(f"Reconnecting shell session for device {serial or 'default'}")
+                session.close()
+                session = AdbShellSession(self.adb_path, serial, self.timeout)
+                session.start()
+        except Exception:
+            self._discard(serial)
+            raise
+        return session
+
+    def _release(self, serial, session):
+        with self.condition:
+            if session.is_alive():
+                self.idle_sessions.setdefault(serial, []).append(session)
+            else:
+                self.session_counts[serial] = self.session_counts.get(serial, 1) - 1
+            self.condition.notify()
+
+    def _discard(self, serial):
+        with self.condition:
+            self.session_counts[serial] = self.session_counts.get(serial, 1) - 1
+            self.condition.notify()
+
+    @contextmanager
+    def session(self, serial=None):
+        """
+        Borrow a session for the given device.
+
+        :param serial: Device serial, or None for the only attached device
+        """
+        session = self._acquire(serial)
+        try:
+            yield session
+        finally:
+            self._release(serial, session)
+
+    def run(self, command, serial=None, timeout=None, retries=1):
+        """
+        Run a command on a pooled session, reconnecting if the session died.
+
+        :param command: Command line to execute on the device
+        :param serial: Device serial, or None for the only attached device
+        :param timeout: Seconds to wait for the command to finish
+        :param retries: Number of reconnect attempts after a session failure
+        :return: (returncode, output) tuple
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.session(serial) as session:
+                    return session.run(command, timeout=timeout)
+            except AdbShellTimeout:
+                # The command may have run; retrying could repeat its side effects
+                raise
+            except (AdbShellError, OSError) as e:
+                if attempt >= retries:
+                    raise AdbShellError(str(e))
+                logger.warning(f"Shell session failed ({e}), reconnecting")
+
+    def close_device(self, serial):
+        """Close all idle sessions for a device, e.g. after it disconnects."""
+        with self.condition:
+            sessions = self.idle_sessions.pop(serial, [])
+            self.session_counts[serial] = self.session_counts.get(serial, 0) - len(sessions)
+            self.condition.notify_all()
+        for session in sessions:
+            session.close()
+
+    def close_all(self):
+        """Close every idle session in the pool."""
+        with self.condition:
+            serials = list(self.idle_sessions)
+        for serial in serials:
+            self.close_device(serial)
@@ -1,7 +1,11 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from extra import AndroidAIAgent  # Import the AndroidAIAgent class from extra.py
+from model import ClassifierStats  # Fast-path classifier hit-rate metrics
+from prompt_budget import prompt_metrics  # Per-prompt token accounting
+from RealTime import search_cache, conversation_context  # Web search cache hit rates and conversation summary state
 import speech_recognition as sr  # For speech-to-text conversion
 import os
+import json
 
 app = Flask(__name__)
 
@@ -36,10 +40,16 @@ def process_voice():
     """
     global last_command_result
     try:
+        # Optional device routing: explicit serial or device tag
+        serial = None
+        tag = None
+
         # Check if the request contains text or an audio file
         if 'command' in request.json:
             # Text input
             command = request.json['command']
+            serial = request.json.get('serial')
+            tag = request.json.get('tag')
         elif 'file' in request.files:
             # Audio file input
             audio_file = request.files['file']
@@ -64,8 +74,8 @@ def process_voice():
         else:
             return jsonify({"error": "No command or audio file provided"}), 400
 
-        # Send the command to AndroidAIAgent
-        result = agent.execute_android_command(command)
+        # Send the command to AndroidAIAgent's worker for the target device
+        result = agent.dispatch_command(command, serial=serial, tag=tag).result()
 
         if result is None:
             last_command_result = {"error": "Failed to process command"}
@@ -79,6 +89,49 @@ def process_voice():
         last_command_result = {"error": str(e)}
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stream_voice', methods=['POST'])
+def stream_voice():
+    """
+    Endpoint to process a voice command and stream the answer as Server-Sent Events.
+
+    JSON body: command, and optionally serial and tag. POST only, so a link
+    or a prefetch can never run a command. Events: 'task' when a task
+    starts, 'token' for each piece of an answer as it is generated,
+    'result' when a task has finished, then 'done' or 'error'.
+    """
+    data = request.get_json(silent=True) or {}
+    command = data.get('command')
+    if not command:
+        return jsonify({"error": "No command provided"}), 400
+    serial = data.get('serial')
+    tag = data.get('tag')
+
+    def events():
+        global last_command_result
+        results = []
+        try:
+            for event, data in agent.stream_command(command, serial=serial, tag=tag):
+                if event == 'result':
+                    results.append(data['result'] if data['error'] is None else {"error": data['error']})
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            if not results:
+                last_command_result = {"error": "Failed to process command"}
+                yield f"event: error\ndata: {json.dumps(last_command_result)}\n\n"
+                return
+            # Store the result for the response page
+            last_command_result = {"result": results[0] if len(results) == 1 else results}
+            yield f"event: done\ndata: {json.dumps(last_command_result, default=str)}\n\n"
+        except Exception as e:
+            last_command_result = {"error": str(e)}
+            yield f"event: error\ndata: {json.dumps(last_command_result)}\n\n"
+
+    # Disable caching and proxy buffering so each event is delivered immediately
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 @app.route('/api/get_response', methods=['GET'])
 def get_response():
     """
@@ -95,8 +148,14 @@ def status():
     Endpoint to check the status of the AndroidAIAgent.
     """
     try:
-        # Check if the agent is running
-        return jsonify({"status": "running"}), 200
+        # Check if the agent is running and report how much classification stayed local, prompt sizes, search cache hits and the conversation summary
+        return jsonify({
+            "status": "running",
+            "classifier": ClassifierStats(),
+            "prompts": prompt_metrics.stats(),
+            "search": search_cache.stats(),
+            "context": conversation_context.stats(),
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
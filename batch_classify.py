@@ -0,0 +1,222 @@
+"""
+Batch classification of logged utterances.
+
+Streams a JSONL file of utterances through the classifier with bounded
+concurrency, writes one JSONL result per input line (in input order) and
+prints a throughput and latency report. Useful for warming the caches,
+comparing classifier backends and catching regressions against an
+earlier run.
+
+Usage:
+    python batch_classify.py utterances.jsonl -o results.jsonl
+    python batch_classify.py utterances.jsonl --backend local --compare results.jsonl
+    python batch_classify.py requests.jsonl --field title --concurrency 16 --json report.json
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from collections import Counter, deque
+
+import model
+from latency_stats import percentile
+
+BACKENDS = ['full', 'local', 'fast', 'remote']
+# Fields tried, in order, when --field is not given
+TEXT_FIELDS = ['utterance', 'text', 'command', 'query', 'prompt']
+
+
+def read_utterances(path, field=None):
+    """
+    Yield (line_number, id, utterance) from a JSONL file. A line may be a
+    JSON object or a bare JSON string; blank and unparsable lines are skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping line {number}: not JSON")
+                continue
+            if isinstance(record, str):
+                yield number, number, record
+                continue
+            fields = [field] if field else TEXT_FIELDS
+            text = next((record[name] for name in fields if isinstance(record.get(name), str)), None)
+            if text is None:
+                logging.warning(f"Skipping line {number}: no {' / '.join(fields)} field")
+                continue
+            yield number, record.get('id', record.get('request_id', number)), text
+
+
+async def classify(utterance, backend):
+    """
+    Classify one utterance with the chosen backend.
+
+    :return: (tasks, source) where source names the layer that answered
+    """
+    if backend in ('full', 'local', 'fast'):
+        tasks = model.fast_classifier.classify(utterance)
+        if tasks:
+            return tasks, 'fast'
+    if backend in ('full', 'local'):
+        tasks = model.classification_cache.get(utterance)
+        if tasks:
+            return tasks, 'cache'
+        tasks = model.IndexDMM(utterance)
+        if tasks:
+            return tasks, 'index'
+    if backend in ('full', 'remote'):
+        # The remote backends learn into the cache and index as a side effect
+        return [task async for task in model.HedgedDMMStreamAsync(utterance)], 'remote'
+    return None, 'none'
+
+
+async def run_batch(utterances, backend, concurrency, output=None):
+    """
+    Classify utterances with at most `concurrency` in flight.
+
+    Results are written in input order; only a window of pending lookups is
+    held in memory, so arbitrarily long files stream through.
+
+    :return: List of result dicts (without the tasks, to keep memory flat)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def classify_one(number, request_id, utterance):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                tasks, source = await classify(utterance, backend)
+                error = None
+            except Exception as e:
+                tasks, source, error = None, 'error', str(e)
+            return {
+                'line': number,
+                'id': request_id,
+                'utterance': utterance,
+                'tasks': tasks,
+                'source': source,
+                'latency_ms': (time.perf_counter() - started) * 1000,
+                'error': error,
+            }
+
+    summary = []
+    pending = deque()
+
+    def write(result):
+        if output is not None:
+            output.write(json.dumps(result) + "\n")
+        summary.append({key: result[key] for key in ('id', 'source', 'latency_ms', 'error')})
+
+    for number, request_id, utterance in utterances:
+        pending.append(asyncio.ensure_future(classify_one(number, request_id, utterance)))
+        if len(pending) >= concurrency * 2:
+            write(await pending.popleft())
+    while pending:
+        write(await pending.popleft())
+    return summary
+
+
+def compare_results(results_path, baseline_path):
+    """
+    Compare two result files by id.
+
+    :return: Dict with the number of ids compared, how many changed, and
+             up to 20 examples of changes
+    """
+    def load(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return {str(r['id']): r for r in (json.loads(line) for line in f if line.strip())}
+
+    current, baseline = load(results_path), load(baseline_path)
+    shared = [key for key in current if key in baseline]
+    changed = [key for key in shared if current[key]['tasks'] != baseline[key]['tasks']]
+    return {
+        'compared': len(shared),
+        'changed': len(changed),
+        'examples': [
+            {'id': key, 'utterance': current[key]['utterance'],
+             'before': baseline[key]['tasks'], 'after': current[key]['tasks']}
+            for key in changed[:20]
+        ],
+    }
+
+
+def summarize(summary, elapsed):
+    latencies = [r['latency_ms'] for r in summary]
+    return {
+        'utterances': len(summary),
+        'errors': sum(1 for r in summary if r['error']),
+        'sources': dict(Counter(r['source'] for r in summary)),
+        'elapsed_s': elapsed,
+        'throughput_per_s': len(summary) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+    }
+
+
+def print_report(report, comparison=None):
+    print(f"utterances   {report['utterances']}")
+    print(f"errors       {report['errors']}")
+    print(f"sources      {', '.join(f'{k}={v}' for k, v in sorted(report['sources'].items()))}")
+    print(f"elapsed      {report['elapsed_s']:.2f}s ({report['throughput_per_s']:.1f}/s)")
+    print(f"latency ms   p50 {report['p50_ms']:.1f}  p95 {report['p95_ms']:.1f}  "
+          f"p99 {report['p99_ms']:.1f}  mean {report['mean_ms']:.1f}")
+    if comparison is not None:
+        print(f"changed      {comparison['changed']} of {comparison['compared']} compared")
+        for example in comparison['examples']:
+            print(f"  [{example['id']}] {example['utterance']!r}: {example['before']} -> {example['after']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a JSONL file of utterances in bulk.")
+    parser.add_argument('input', help="JSONL file with one utterance per line")
+    parser.add_argument('-o', '--output', help="Write results to this JSONL file")
+    parser.add_argument('--field', help=f"Field holding the utterance (default: first of {', '.join(TEXT_FIELDS)})")
+    parser.add_argument('--backend', choices=BACKENDS, default='full',
+                        help="full: every layer; local: no remote calls; fast: rules only; remote: skip local layers")
+    parser.add_argument('--concurrency', type=int, default=8, help="Utterances classified at once")
+    parser.add_argument('--limit', type=int, help="Stop after this many utterances")
+    parser.add_argument('--compare', help="Earlier results JSONL to diff against (needs --output)")
+    parser.add_argument('--json', help="Write the report to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="Show classifier logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if args.compare and not args.output:
+        parser.error("--compare needs --output")
+
+    utterances = read_utterances(args.input, args.field)
+    if args.limit:
+        utterances = (item for _, item in zip(range(args.limit), utterances))
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    started = time.perf_counter()
+    try:
+        summary = asyncio.run(run_batch(utterances, args.backend, max(args.concurrency, 1), output))
+    finally:
+        if output is not None:
+            output.close()
+        model.intent_index.save()
+    report = summarize(summary, time.perf_counter() - started)
+    report['backend'] = args.backend
+    report['classifier'] = model.ClassifierStats()
+
+    comparison = compare_results(args.output, args.compare) if args.compare else None
+    print_report(report, comparison)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'report': report, 'comparison': comparison}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
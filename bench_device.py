@@ -0,0 +1,147 @@
+"""
+Latency benchmark for the AndroidAIAgent device layer.
+
+Runs the agent against the fake adb in fake_adb.py, so no phone is needed,
+and reports p50/p95/p99 latency and throughput per scenario.
+
+Usage:
+    python bench_device.py --iterations 20
+    python bench_device.py --scenarios open_app screenshot --spawn-latency 0.1 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import logging
+
+import fake_adb
+from latency_stats import percentile
+from extra import AndroidAIAgent
+
+SCENARIOS = ['open_app', 'open_app_cold', 'screenshot', 'capture_screen', 'text_input', 'google_pay', 'calendar']
+
+TEXT_MESSAGE = "Meeting moved to 5pm, bring the Q3 report!"
+
+
+def summarize(name, durations, failures):
+    total = sum(durations)
+    return {
+        'scenario': name,
+        'runs': len(durations),
+        'failures': failures,
+        'p50_ms': percentile(durations, 0.50) * 1000,
+        'p95_ms': percentile(durations, 0.95) * 1000,
+        'p99_ms': percentile(durations, 0.99) * 1000,
+        'mean_ms': total / len(durations) * 1000 if durations else 0.0,
+        'throughput_per_s': len(durations) / total if total else 0.0,
+    }
+
+
+def build_scenarios(agent):
+    """Map scenario names to zero-argument callables returning a truthy result on success."""
+    def open_app_cold():
+        agent.package_index.invalidate(agent.current_serial())
+        agent.launch_cache.clear(agent.current_serial())
+        return agent.open_app('com.whatsapp', 'WhatsApp')
+
+    return {
+        'open_app': lambda: agent.open_app('com.whatsapp', 'WhatsApp'),
+        'open_app_cold': open_app_cold,
+        'screenshot': agent.take_screenshot,
+        'capture_screen': agent.capture_screen,
+        'text_input': lambda: agent.adb_input_text(TEXT_MESSAGE),
+        'google_pay': lambda: agent.initiate_google_pay_transaction('Alice', '150 rupees'),
+        'calendar': lambda: agent.schedule_google_calendar_event('Team sync', '12/08/2025'),
+    }
+
+
+def run_benchmark(agent, scenarios, iterations, warmup=1):
+    callables = build_scenarios(agent)
+    results = []
+    for name in scenarios:
+        func = callables[name]
+        for _ in range(warmup):
+            func()
+        durations = []
+        failures = 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            try:
+                ok = func()
+            except Exception:
+                ok = False
+            durations.append(time.perf_counter() - started)
+            if not ok:
+                failures += 1
+        results.append(summarize(name, durations, failures))
+    return results
+
+
+def print_report(results):
+    header = f"{'scenario':<16}{'runs':>6}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'ops/s':>9}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<16}{r['runs']:>6}{r['failures']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['mean_ms']:>10.1f}{r['throughput_per_s']:>9.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AndroidAIAgent device layer against a fake adb.")
+    parser.add_argument('--iterations', type=int, default=10, help="Measured runs per scenario")
+    parser.add_argument('--warmup', type=int, default=1, help="Unmeasured runs per scenario")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--spawn-latency', type=float, default=0.05, help="Seconds added to every adb process start")
+    parser.add_argument('--command-latency', type=float, default=0.01, help="Seconds added to every device command")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Probability that an `input` command fails")
+    parser.add_argument('--config', help="JSON file with extra fake adb config overrides")
+    parser.add_argument('--json', help="Write results to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="Show agent logging")
+    args = parser.parse_args()
+
+    # extra.py configures INFO logging on import; quieten it unless asked
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    work_dir = tempfile.mkdtemp(prefix='bench_device_')
+    config = {
+        'spawn_latency': args.spawn_latency,
+        'latency': dict(fake_adb.DEFAULT_CONFIG['latency'], default=args.command_latency),
+        'failures': {'input': args.failure_rate} if args.failure_rate else {},
+        'seed': 1234,
+    }
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    adb_path = fake_adb.write_launcher(work_dir, config)
+
+    # Screenshots are saved relative to the working directory
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        agent = AndroidAIAgent(adb_path=adb_path, enable_voice=False)
+        if not agent.verify_device_connection():
+            print("Fake device did not come online", file=sys.stderr)
+            return 1
+        try:
+            results = run_benchmark(agent, args.scenarios, args.iterations, args.warmup)
+        finally:
+            agent.stop_screen_stream()
+            agent.device_watcher.stop()
+            agent.fleet.shutdown()
+            agent.shell_pool.close_all()
+    finally:
+        os.chdir(previous_dir)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': config, 'results': results}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import os
+import json
+import hashlib
+import threading
+import logging
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(messages):
+    """Identify a run of messages by their roles and contents."""
+    data = json.dumps([[m.get('role'), m.get('content')] for m in messages], ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class ConversationContext:
+    """
+    Bounded chat history for answer prompts.
+
+    The last keep_turns turns are sent verbatim. Older turns are folded
+    into a rolling summary by a background thread, a few messages at a
+    time, each time handing the summarizer only the previous summary and
+    the newly aged-out messages. Building a prompt never waits for the
+    summarizer, so its size and the answer latency stay flat however long
+    the conversation gets.
+
+    The summary is persisted together with a fingerprint of the last
+    messages folded into it, so a restart picks up where it left off.
+    """
+
+    def __init__(self, store, summarize, keep_turns=6, summarize_every=4, path=None):
+        """
+        :param store: ConversationStore holding the conversation
+        :param summarize: Callable (summary, messages) -> new summary text
+        :param keep_turns: Most recent turns (user + assistant) kept verbatim
+        :param summarize_every: Fold once at least this many messages have aged out
+        :param path: JSON file the summary is persisted to, or None
+        """
+        self.store = store
+        self.summarize = summarize
+        self.keep_messages = keep_turns * 2
+        self.summarize_every = max(summarize_every, 2)
+        self.path = path
+        self.summary = ""
+        self.marker = None
+        self.folds = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        if path:
+            self.load()
+
+    def history(self):
+        """
+        Messages that have aged out of the window but are not in the
+        summary yet are sent verbatim too, so nothing drops out of the
+        prompt while a fold is running or after one failed.
+
+        :return: (summary, messages) for the next prompt
+        """
+        messages = self.store.messages()
+        with self.lock:
+            summary = self.summary
+        recent = messages[-self.keep_messages:] if self.keep_messages else []
+        return summary, self.pending(messages) + recent
+
+    def pending(self, messages=None):
+        """
+        :param messages: Snapshot of the conversation, or None for the current one
+        :return: Messages that have aged out of the verbatim window but are
+                 not in the summary yet, oldest first
+        """
+        if messages is None:
+            messages = self.store.messages()
+        older = messages[:max(len(messages) - self.keep_messages, 0)]
+        with self.lock:
+            marker = self.marker
+        if marker is None:
+            return older
+        # The marker covers the last two messages folded in; search from the newest
+        for end in range(len(older), 1, -1):
+            if _fingerprint(older[end - 2:end]) == marker:
+                return older[end:]
+        # Not in the in-memory tail any more: fold what is there
+        return older
+
+    def update(self):
+        """Start folding aged-out messages into the summary in the background, if enough have built up."""
+        if len(self.pending()) < self.summarize_every:
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._fold, daemon=True, name="conversation-summary")
+            self.thread.start()
+
+    def _fold(self):
+        while True:
+            pending = self.pending()
+            if len(pending) < self.summarize_every:
+                return
+            with self.lock:
+                summary = self.summary
+            try:
+                summary = self.summarize(summary, pending)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Conversation summary update failed, will retry after the next turn: {e}")
+                return
+            with self.lock:
+                self.summary = summary.strip()
+                self.marker = _fingerprint(pending[-2:])
+                self.folds += 1
+            logger.info(f"Folded {len(pending)} messages into the conversation summary")
+            self.save()
+
+    def save(self):
+        """Write the summary to disk atomically."""
+        if not self.path:
+            return
+        with self.lock:
+            data = {'summary': self.summary, 'marker': self.marker}
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not save conversation summary to {self.path}: {e}")
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load conversation summary from {self.path}: {e}")
+            return
+        with self.lock:
+            self.summary = data.get('summary') or ""
+            self.marker = data.get('marker')
+
+    def stats(self):
+        """
+        :return: Dict with the summary size, folds, failures and pending messages
+        """
+        with self.lock:
+            summary, folds, failures = self.summary, self.folds, self.failures
+        return {
+            'summary_chars': len(summary),
+            'folds': folds,
+            'failures': failures,
+            'pending': len(self.pending()),
+            'keep_messages': self.keep_messages,
+        }
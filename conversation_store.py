@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import threading
+import logging
+from collections import deque
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def _parse_line(line):
+    """Decode one log line; a torn or corrupt line (e.g. after a crash) yields None."""
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) and 'role' in message else None
+
+
+def read_tail(path, count):
+    """
+    Read the last `count` messages of a JSONL log without reading the whole
+    file: blocks are read backwards from the end until enough lines are found.
+    """
+    if count <= 0:
+        return []
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b""
+            while position > 0 and data.count(b"\n") <= count:
+                step = min(READ_BLOCK_SIZE, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+    except FileNotFoundError:
+        return []
+    lines = data.splitlines()
+    if position > 0:
+        lines = lines[1:]  # The first line may be cut off
+    messages = [m for m in (_parse_line(line) for line in lines if line.strip()) if m is not None]
+    return messages[-count:]
+
+
+class ConversationStore:
+    """
+    Append-only conversation log.
+
+    Each message is one JSON line appended to the active file and fsynced,
+    so a turn costs O(1) I/O however long the history is, and a crash can at
+    worst leave a torn last line, which is skipped on load. The most recent
+    messages are kept in memory for building prompts. When the active file
+    passes max_bytes it is rotated to a numbered segment; a background
+    thread folds old segments into a single archive file.
+    """
+
+    def __init__(self, path="ChatLog.jsonl", tail_size=200, max_bytes=1024 * 1024, keep_segments=3,
+                 legacy_paths=None):
+        """
+        :param path: Active JSONL log file
+        :param tail_size: Messages kept in memory
+        :param max_bytes: Rotate the active file once it grows past this size
+        :param keep_segments: Rotated segments left as they are; older ones are compacted
+        :param legacy_paths: JSON array chat logs to import if the store is new
+        """
+        self.path = path
+        self.archive_path = f"{path}.archive"
+        self.max_bytes = max_bytes
+        self.keep_segments = keep_segments
+        self.tail = deque(maxlen=tail_size)
+        self.lock = threading.Lock()
+        self.compaction_lock = threading.Lock()
+        self.compaction_thread = None
+        self.file = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path) and not self.segments():
+            self._migrate(legacy_paths or [])
+        self._load_tail()
+        self.file = open(path, 'ab')
+        self.size = self.file.tell()
+        self._terminate_torn_line()
+
+    def _terminate_torn_line(self):
+        """End a line torn by a crash, so the next append starts on a fresh line."""
+        if self.size == 0:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n":
+                return
+        self.file.write(b"\n")
+        self.file.flush()
+        self.size += 1
+
+    def segments(self):
+        """Rotated segment paths, oldest first."""
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        pattern = re.compile(re.escape(prefix) + r"(\d+)$")
+        numbered = []
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                numbered.append((int(match.group(1)), os.path.join(directory, name)))
+        return [path for _, path in sorted(numbered)]
+
+    def _load_tail(self):
+        needed = self.tail.maxlen
+        messages = []
+        for path in [self.path] + self.segments()[::-1] + [self.archive_path]:
+            if len(messages) >= needed:
+                break
+            messages = read_tail(path, needed - len(messages)) + messages
+        self.tail.extend(messages)
+
+    def _migrate(self, legacy_paths):
+        """Import the first legacy JSON array log found, leaving the old file in place."""
+        for legacy_path in legacy_paths:
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    messages = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(messages, list) or not messages:
+                continue
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'wb') as f:
+                for message in messages:
+                    if isinstance(message, dict) and 'role' in message:
+                        f.write(self._encode(message))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            logger.info(f"Migrated {len(messages)} messages from {legacy_path} to {self.path}")
+            return
+
+    @staticmethod
+    def _encode(message):
+        return (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def append(self, *messages):
+        """
+        Append messages as one write, then fsync.
+
+        :param messages: Dicts with 'role' and 'content'
+        """
+        data = b"".join(self._encode(message) for message in messages)
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.size += len(data)
+            self.tail.extend(messages)
+            if self.size >= self.max_bytes:
+                self._rotate()
+
+    def append_turn(self, user, assistant):
+        """Append a user message and the assistant's answer."""
+        self.append({"role": "user", "content": user}, {"role": "assistant", "content": assistant})
+
+    def messages(self, limit=None):
+        """
+        :param limit: Number of most recent messages, or None for the whole tail
+        :return: List of message dicts, oldest first
+        """
+        with self.lock:
+            messages = list(self.tail)
+        return messages[-limit:] if limit else messages
+
+    def _rotate(self):
+        """Move the active file to the next segment number. Caller holds the lock."""
+        self.file.close()
+        segments = self.segments()
+        next_number = int(segments[-1].rsplit(".", 1)[1]) + 1 if segments else 1
+        os.replace(self.path, f"{self.path}.{next_number}")
+        self.file = open(self.path, 'ab')
+        self.size = 0
+        logger.info(f"Rotated conversation log to {self.path}.{next_number}")
+        if len(segments) + 1 > self.keep_segments:
+            self.compact_in_background()
+
+    def compact_in_background(self):
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            return
+        self.compaction_thread = threading.Thread(target=self.compact, daemon=True, name="chatlog-compaction")
+        self.compaction_thread.start()
+
+    def compact(self):
+        """
+        Fold all but the newest keep_segments segments into the archive.
+
+        The new archive is written to a temporary file, fsynced and swapped in
+        with os.replace before any segment is deleted, so a crash at any
+        point loses nothing; corrupt lines are dropped on the way.
+        """
+        with self.compaction_lock:
+            segments = self.segments()
+            segments = segments[:max(len(segments) - self.keep_segments, 0)]
+            if not segments:
+                return
+            temp_path = f"{self.archive_path}.tmp"
+            kept = 0
+            try:
+                with open(temp_path, 'wb') as out:
+                    for path in [self.archive_path] + segments:
+                        try:
+                            with open(path, 'rb') as f:
+                                for line in f:
+                                    if _parse_line(line) is not None:
+                                        out.write(line if line.endswith(b"\n") else line + b"\n")
+                                        kept += 1
+                        except FileNotFoundError:
+                            continue
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(temp_path, self.archive_path)
+                for path in segments:
+                    os.remove(path)
+                logger.info(f"Compacted {len(segments)} conversation segments into {self.archive_path} ({kept} messages)")
+            except OSError as e:
+                logger.error(f"Conversation log compaction failed: {e}")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
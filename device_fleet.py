@@ -0,0 +1,183 @@
+import threading
+import queue
+import logging
+from concurrent.futures import Future
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+
+class DeviceNotFoundError(LookupError):
+    """Raised when no connected device matches a routing request."""
+
+
+class DeviceWorker:
+    """
+    A worker thread bound to one device. Jobs submitted to it run one at a
+    time, in order, inside the device context supplied by the fleet.
+    """
+
+    def __init__(self, serial, device_context):
+        self.serial = serial
+        self.device_context = device_context
+        self.jobs = queue.Queue()
+        self.pending = 0
+        self.stopped = False
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"device-{serial or 'default'}")
+        self.thread.start()
+
+    @property
+    def load(self):
+        """Number of queued plus running jobs."""
+        with self.lock:
+            return self.pending
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        if threading.current_thread() is self.thread:
+            # Submitted from one of our own jobs: run it now rather than
+            # queue behind the job that is waiting for it
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        with self.lock:
+            # Checked under the lock stop() takes, so no job lands behind the sentinel
+            if self.stopped:
+                future.set_exception(RuntimeError(f"Device worker {self.serial} has stopped"))
+                return future
+            self.pending += 1
+            self.jobs.put((future, func, args, kwargs))
+        return future
+
+    def stop(self):
+        """Finish queued jobs, then exit. Jobs submitted after this fail at once."""
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+            self.jobs.put(None)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            future, func, args, kwargs = job
+            try:
+                if future.set_running_or_notify_cancel():
+                    with self.device_context(self.serial):
+                        future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+
+class DeviceFleet:
+    """
+    Registry of attached devices with one worker per device.
+
+    Jobs are routed by explicit serial, by tag, or to the least-busy device,
+    so work for different phones runs in parallel while work for the same
+    phone stays ordered.
+    """
+
+    def __init__(self, device_context, device_tags=None):
+        """
+        :param device_context: Callable serial -> context manager that makes
+                               device commands target that serial
+        :param device_tags: Optional dict of serial -> iterable of tags
+        """
+        self.device_context = device_context
+        self.tags = {serial: set(tags) for serial, tags in (device_tags or {}).items()}
+        self.workers = {}
+        self.lock = threading.Lock()
+
+    def on_device_state_change(self, serial, old_state, new_state):
+        """DeviceWatcher listener that keeps the worker set in sync."""
+        if new_state == 'device':
+            self.add_device(serial)
+        else:
+            self.remove_device(serial)
+
+    def add_device(self, serial, tags=None):
+        with self.lock:
+            if tags is not None:
+                self.tags[serial] = set(tags)
+            if serial not in self.workers:
+                self.workers[serial] = DeviceWorker(serial, self.device_context)
+                logger.info(f"Registered device {serial} with tags {sorted(self.tags.get(serial, []))}")
+
+    def remove_device(self, serial):
+        with self.lock:
+            worker = self.workers.pop(serial, None)
+        if worker:
+            worker.stop()
+            logger.info(f"Unregistered device {serial}")
+
+    def set_tags(self, serial, tags):
+        with self.lock:
+            self.tags[serial] = set(tags)
+
+    def devices(self):
+        """Return a snapshot of serial -> {'tags', 'load'} for registered devices."""
+        with self.lock:
+            return {
+                serial: {'tags': sorted(self.tags.get(serial, [])), 'load': worker.load}
+                for serial, worker in self.workers.items()
+            }
+
+    def _select_worker(self, serial=None, tag=None):
+        with self.lock:
+            if serial is not None:
+                worker = self.workers.get(serial)
+                if worker is None:
+                    raise DeviceNotFoundError(f"Device {serial} is not connected")
+                return worker
+
+            candidates = [
+                worker for worker_serial, worker in self.workers.items()
+                if worker_serial is not None
+                and (tag is None or tag in self.tags.get(worker_serial, ()))
+            ]
+            if candidates:
+                return min(candidates, key=lambda worker: worker.load)
+            if tag is not None:
+                raise DeviceNotFoundError(f"No connected device tagged '{tag}'")
+
+            # No registered devices yet; use the implicit default device
+            worker = self.workers.get(None)
+            if worker is None:
+                worker = self.workers[None] = DeviceWorker(None, self.device_context)
+            return worker
+
+    def select(self, serial=None, tag=None):
+        """
+        Pick a device the same way submit does, without queueing anything.
+
+        :return: Serial of the chosen device, None for the default device
+        """
+        return self._select_worker(serial, tag).serial
+
+    def submit(self, func, *args, serial=None, tag=None, **kwargs):
+        """
+        Run func(*args, **kwargs) on a device worker.
+
+        :param serial: Route to this device
+        :param tag: Route to the least-busy device carrying this tag
+        :return: concurrent.futures.Future with the result
+        """
+        worker = self._select_worker(serial, tag)
+        logger.info(f"Routing {getattr(func, '__name__', func)} to device {worker.serial or 'default'}")
+        return worker.submit(func, *args, **kwargs)
+
+    def shutdown(self):
+        with self.lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+        for worker in workers:
+            worker.stop()
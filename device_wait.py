@@ -0,0 +1,56 @@
+import time
+import logging
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+
+class WaitTimeout(Exception):
+    """Raised by wait_until when a condition is not met in time."""
+
+
+def wait_until(condition, timeout=10.0, initial_interval=0.1, max_interval=1.0, backoff=1.5,
+               description=None, raise_on_timeout=False):
+    """
+    Poll a condition until it returns a truthy value or the timeout expires.
+
+    The polling interval starts small, so fast devices are not held back, and
+    grows geometrically up to `max_interval` so slow ones are not hammered.
+    Exceptions raised by the condition count as "not yet".
+
+    :param condition: Zero-argument callable
+    :param timeout: Maximum seconds to wait
+    :param initial_interval: First delay between polls
+    :param max_interval: Upper bound for the delay between polls
+    :param backoff: Factor the delay grows by after each poll
+    :param description: Text used in log messages
+    :param raise_on_timeout: Raise WaitTimeout instead of returning None
+    :return: The condition's truthy result, or None on timeout
+    """
+    description = description or getattr(condition, '__name__', 'condition')
+    started = time.monotonic()
+    deadline = started + timeout
+    interval = initial_interval
+    attempts = 0
+
+    while True:
+        attempts += 1
+        try:
+            result = condition()
+        except Exception as e:
+            logger.debug(f"Wait condition '{description}' raised: {e}")
+            result = None
+        if result:
+            logger.info(f"'{description}' met after {time.monotonic() - started:.2f}s ({attempts} checks)")
+            return result
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+    logger.warning(f"Timed out after {timeout}s waiting for '{description}'")
+    if raise_on_timeout:
+        raise WaitTimeout(f"Timed out after {timeout}s waiting for '{description}'")
+    return None
@@ -0,0 +1,189 @@
+import subprocess
+import threading
+import time
+import logging
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+
+def parse_device_list(output):
+    """
+    Parse `adb devices` style output into a serial -> state mapping.
+
+    :param output: Lines of "serial<TAB>state"; a header line is ignored
+    :return: Dict of device serial to state ("device", "offline", ...)
+    """
+    devices = {}
+    for line in output.splitlines():
+        line = line.strip()
+        if not line or line.startswith("List of devices") or line.startswith("*"):
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            devices[parts[0]] = parts[1]
+    return devices
+
+
+class DeviceWatcher:
+    """
+    Background watcher that keeps a live table of attached devices.
+
+    It follows `adb track-devices`, which pushes a fresh device list whenever
+    something changes, and falls back to polling `adb devices` if tracking is
+    unavailable. Listeners are called as callback(serial, old_state, new_state)
+    on every change; a state of None means the device went away.
+    """
+
+    def __init__(self, adb_path, poll_interval=2.0):
+        self.adb_path = adb_path
+        self.poll_interval = poll_interval
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.process = None
+
+    def start(self):
+        """Start the watcher thread."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self.thread.start()
+        logger.info("Device watcher started")
+
+    def stop(self):
+        """Stop the watcher thread and its adb process."""
+        self.stopped.set()
+        process = self.process
+        if process:
+            try:
+                process.kill()
+            except Exception:
+                pass
+
+    def add_listener(self, callback):
+        """Register callback(serial, old_state, new_state) for device changes."""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def get_devices(self):
+        """Return a snapshot of the serial -> state table."""
+        with self.lock:
+            return dict(self.devices)
+
+    def connected_devices(self):
+        """Return serials of devices that are online and authorised."""
+        with self.lock:
+            return [serial for serial, state in self.devices.items() if state == 'device']
+
+    def is_connected(self, serial=None):
+        """
+        Check connection state from memory.
+
+        :param serial: Device serial, or None for "any device"
+        :return: True if the device (or any device) is online
+        """
+        with self.lock:
+            if serial is None:
+                return any(state == 'device' for state in self.devices.values())
+            return self.devices.get(serial) == 'device'
+
+    def wait_ready(self, timeout=None):
+        """Block until the first device list has been received."""
+        return self.ready.wait(timeout)
+
+    def _update(self, devices):
+        with self.lock:
+            previous = self.devices
+            self.devices = devices
+        self.ready.set()
+
+        for serial in set(previous) | set(devices):
+            old_state = previous.get(serial)
+            new_state = devices.get(serial)
+            if old_state == new_state:
+                continue
+            logger.info(f"Device {serial} changed state: {old_state} -> {new_state}")
+            for callback in list(self.listeners):
+                try:
+                    callback(serial, old_state, new_state)
+                except Exception as e:
+                    logger.error(f"Device listener error: {e}")
+
+    def _watch_loop(self):
+        backoff = 1.0
+        while not self.stopped.is_set():
+            started = time.monotonic()
+            tracked = self._track_devices()
+            if self.stopped.is_set():
+                break
+            if not tracked:
+                logger.info("adb track-devices unavailable, falling back to polling")
+                self._poll_devices()
+                break
+            # The adb server went away (e.g. restarted); reconnect with backoff
+            if time.monotonic() - started > 10:
+                backoff = 1.0
+            logger.warning(f"Device tracking interrupted, reconnecting in {backoff:.0f}s")
+            self.stopped.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _track_devices(self):
+        """
+        Follow `adb track-devices` until it exits.
+
+        :return: False if the output was not in the expected format
+        """
+        try:
+            self.process = subprocess.Popen(
+                [self.adb_path, 'track-devices'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            logger.error(f"Failed to start adb track-devices: {e}")
+            return False
+
+        stream = self.process.stdout
+        try:
+            while not self.stopped.is_set():
+                # Each update is a 4-digit hex length followed by the device list
+                header = stream.read(4)
+                if len(header) < 4:
+                    return True
+                try:
+                    length = int(header, 16)
+                except ValueError:
+                    return False
+                payload = stream.read(length) if length else b""
+                self._update(parse_device_list(payload.decode('utf-8', errors='replace')))
+            return True
+        finally:
+            try:
+                self.process.kill()
+            except Exception:
+                pass
+            self.process = None
+
+    def _poll_devices(self):
+        """Poll `adb devices` until the watcher is stopped."""
+        while not self.stopped.is_set():
+            try:
+                result = subprocess.run(
+                    [self.adb_path, 'devices'],
+                    capture_output=True,
+                    text=True,
+                    timeout=10
+                )
+                if result.returncode == 0:
+                    self._update(parse_device_list(result.stdout))
+            except Exception as e:
+                logger.error(f"Error polling devices: {e}")
+            self.stopped.wait(self.poll_interval)
@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from fast_intent import PUNCTUATION_PATTERN
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+# Hesitations dropped from cache keys wherever they appear; they never carry content
+FILLER_WORDS = {"um", "uh", "umm", "uhm", "hmm", "er", "erm"}
+# Courtesy and wake words dropped only at the start or end of an utterance, since
+# inside one they can be part of a title ("play hey jude", "play please please me")
+EDGE_WORDS = {"please", "kindly", "hey", "ok", "okay", "jarvis"}
+
+
+def cache_key(utterance):
+    """
+    Build the cache key for an utterance: normalized case, punctuation and
+    whitespace, with hesitations removed and courtesy words trimmed from the
+    ends. Nothing else is stripped: lead-ins like "would you" and words like
+    "just", "so" or "like" can change the query, and a cached answer carries
+    the query text.
+    """
+    text = PUNCTUATION_PATTERN.sub(" ", utterance.lower())
+    words = [word for word in text.split() if word not in FILLER_WORDS]
+    while words and words[0] in EDGE_WORDS:
+        words.pop(0)
+    while words and words[-1] in EDGE_WORDS:
+        words.pop()
+    return " ".join(words)
+
+
+class ClassificationCache:
+    """
+    LRU + TTL cache of FirstLayerDMM results keyed on the normalized
+    utterance, optionally backed by an SQLite file so entries survive
+    restarts and are shared between processes.
+    """
+
+    def __init__(self, max_entries=1000, ttl=7 * 24 * 3600, path=None):
+        """
+        :param max_entries: Entries kept in memory (and on disk)
+        :param ttl: Seconds an entry stays valid
+        :param path: SQLite file for persistence, or None for memory only
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (tasks, stored_at)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            try:
+                self.db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self.db.execute("PRAGMA journal_mode=WAL")
+                # v3 keys keep lead-ins like "would you"; rows keyed the older, lossier ways are left unread
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS classifications_v3 "
+                    "(key TEXT PRIMARY KEY, tasks TEXT NOT NULL, stored_at REAL NOT NULL)"
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Classification cache file unavailable, using memory only: {e}")
+                self.db = None
+
+    def _load_from_disk(self, key):
+        row = self.db.execute(
+            "SELECT tasks, stored_at FROM classifications_v3 WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get(self, utterance):
+        """
+        :return: Cached list of tasks, or None on a miss
+        """
+        key = cache_key(utterance)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None and self.db is not None:
+                try:
+                    entry = self._load_from_disk(key)
+                except sqlite3.Error as e:
+                    logger.error(f"Classification cache read failed: {e}")
+                if entry is not None:
+                    self.entries[key] = entry
+                    self._evict()
+
+            if entry is None or now - entry[1] > self.ttl:
+                if entry is not None:
+                    self.entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def put(self, utterance, tasks):
+        """Store the tasks an utterance was classified as."""
+        key = cache_key(utterance)
+        if not key:
+            return
+        entry = (list(tasks), time.time())
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO classifications_v3 (key, tasks, stored_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(entry[0]), entry[1])
+                    )
+                    # Keep the file bounded and drop expired rows
+                    self.db.execute(
+                        "DELETE FROM classifications_v3 WHERE stored_at < ? OR key NOT IN "
+                        "(SELECT key FROM classifications_v3 ORDER BY stored_at DESC LIMIT ?)",
+                        (entry[1] - self.ttl, self.max_entries)
+                    )
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Classification cache write failed: {e}")
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM classifications_v3")
+                self.db.commit()
+
+    def stats(self):
+        """
+        :return: Dict with hits, misses, hit_rate and size
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self.entries),
+            }
@@ -7,6 +7,8 @@ import sys
 import time
 import logging
 import traceback
+from contextlib import contextmanager
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 
 # NLP and Voice Processing Libraries
@@ -15,29 +17,51 @@ import speech_recognition as sr
 import pyttsx3
 
 # Import custom modules
-from model import FirstLayerDMM
-from RealTime import RealtimeSearchEngine
-from SpeechToText import SpeechRecognition
+from model import ClassifiedCommand, ClassifyStream, intent_index, fast_classifier
+from RealTime import (
+    RealtimeSearchEngineStream, RealtimeSearchEngineStreamAsync, PrefetchContext, SplitSentences, AnswerModifier
+)
+from llm_clients import llm_clients
+from adb_shell import AdbShellPool, AdbShellError
+from package_index import PackageIndex, LaunchCache
+from device_watcher import DeviceWatcher
+from screen_capture import Frame, DiskSink, ScreenStreamer, capture_png
+from device_fleet import DeviceFleet
+from task_scheduler import TaskScheduler, aggregate_results, is_device_task, LLM_CATEGORIES, FINAL_CATEGORIES
+from ui_locator import UiLocator, dump_ui_hierarchy
+from device_wait import wait_until
+from action_batch import ActionBatch
+from text_input import TextEntry
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shell commands that can change what is on screen
+SCREEN_CHANGING_COMMANDS = {'input', 'am', 'monkey'}
+
+# "package/activity" component names as printed by dumpsys
+COMPONENT_PATTERN = re.compile(r'([\w.]+)/([\w.$]+)')
+
+# Macro names become file names in the macros directory, so no separators or dots
+MACRO_NAME_PATTERN = re.compile(r'[\w-]+')
+
 class AndroidAIAgent:
-    def __init__(self, adb_path=None):
+    def __init__(self, adb_path=None, device_tags=None, enable_voice=True):
         # NLP Setup
         try:
             self.nlp = spacy.load("en_core_web_sm")
         except OSError:
             subprocess.run([sys.executable, "-m", "spacy", "download", "en_core_web_sm"])
             self.nlp = spacy.load("en_core_web_sm")
+        # Let the intent index use the pipeline's word vectors if it has any
+        intent_index.set_nlp(self.nlp)
         
-        # Voice Recognition Setup
+        # Voice Recognition and Text-to-Speech Setup (can be disabled for headless runs)
+        self.enable_voice = enable_voice
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        
-        # Text-to-Speech Setup
-        self.tts_engine = pyttsx3.init()
+        self.microphone = sr.Microphone() if enable_voice else None
+        self.tts_engine = pyttsx3.init() if enable_voice else None
         
         # Command Queue for thread-safe processing
         self.command_queue = queue.Queue()
@@ -46,6 +70,50 @@ class AndroidAIAgent:
         self.adb_path = adb_path or self.find_adb_path()
         logger.info(f"Using ADB path: {self.adb_path}")
 
+        # Device targeted by the current thread (None = the only attached device)
+        self.device_context = threading.local()
+
+        # Persistent shell sessions for low-latency input commands
+        self.shell_pool = AdbShellPool(self.adb_path)
+
+        # Installed-package index and memo of working launch activities
+        self.package_index = PackageIndex(lambda command, serial: self.adb_shell(command, check=False, serial=serial)[1])
+        self.launch_cache = LaunchCache()
+
+        # One worker per attached device; commands are routed by serial, tag or load
+        self.fleet = DeviceFleet(self.use_device, device_tags)
+
+        # Runs every task of an utterance: device tasks in order per phone, the rest alongside them
+        self.task_scheduler = TaskScheduler(
+            self.fleet, self.run_task, execute_async=self.run_llm_task, runner=llm_clients
+        )
+
+        # Background device watcher keeps connection state in memory
+        self.device_watcher = DeviceWatcher(self.adb_path)
+        self.device_watcher.add_listener(self.on_device_state_change)
+        self.device_watcher.add_listener(self.fleet.on_device_state_change)
+        self.device_watcher.start()
+
+        # Screenshots are captured in memory; saving to disk happens in the background
+        self.screenshot_sink = DiskSink(os.path.join(os.getcwd(), 'screenshots'))
+        self.screen_streamer = None
+
+        # View-hierarchy locator, cached until the screen changes
+        self.ui_locator = UiLocator(lambda serial: dump_ui_hierarchy(self.adb_path, serial))
+
+        # Text entry picks the fastest working mode per device
+        self.text_entry = TextEntry(
+            lambda command, serial: self.adb_shell(command, check=False, serial=serial),
+            lambda package, serial: self.package_index.resolve(package, serial) == package
+        )
+
+        # Macro recording of primitive actions
+        self.macros_dir = os.path.join(os.getcwd(), 'macros')
+        self.recording = None
+        self.recording_capture_timing = False
+        self.last_recorded_at = None
+        self.recording_lock = threading.Lock()
+
         # Predefined app packages for easier launching
         self.app_packages = {
             'messages': 'com.google.android.apps.messaging',
@@ -101,9 +169,14 @@ class AndroidAIAgent:
             'notes': 'com.google.android.keep',
             'note': 'com.google.android.keep'
         }
+        # The rule-based classifier only opens or closes apps it knows about
+        fast_classifier.set_known_apps(self.app_packages)
         
         # Threading lock for text-to-speech
         self.speak_lock = threading.Lock()
+        # Text waiting to be spoken, in order, by a single speech thread
+        self.speech_queue = queue.Queue()
+        self.speech_thread = None
 
     def find_adb_path(self):
         """Locate ADB executable"""
@@ -161,6 +234,61 @@ or set the ANDROID_SDK_ROOT or ANDROID_HOME environment variable.
 Alternatively, provide ADB path explicitly when creating the agent instance.
 """)
 
+    def current_serial(self):
+        """Serial of the device targeted by the calling thread, or None."""
+        return getattr(self.device_context, 'serial', None)
+
+    @contextmanager
+    def use_device(self, serial):
+        """
+        Make device commands issued by this thread target the given serial.
+        
+        :param serial: Device serial, or None for the only attached device
+        """
+        previous = self.current_serial()
+        self.device_context.serial = serial
+        try:
+            yield
+        finally:
+            self.device_context.serial = previous
+
+    def adb_shell(self, *args, check=True, timeout=None, serial=None):
+        """
+        Run a shell command on the device through the persistent session pool.
+        
+        :param args: Command arguments, joined with spaces as `adb shell` does
+        :param check: Raise AdbShellError if the command exits non-zero
+        :param timeout: Seconds to wait for the command to finish
+        :param serial: Target device (defaults to the current thread's device)
+        :return: (returncode, output) tuple
+        """
+        command = ' '.join(str(arg) for arg in args)
+        serial = serial or self.current_serial()
+        returncode, output = self.shell_pool.run(command, serial=serial, timeout=timeout)
+        if command.split(None, 1)[0] in SCREEN_CHANGING_COMMANDS:
+            # The cached view hierarchy no longer matches the screen
+            self.ui_locator.invalidate(serial)
+        if check and returncode != 0:
+            raise AdbShellError(f"Command '{command}' failed with exit code {returncode}: {output.strip()}")
+        return returncode, output
+
+    def on_device_state_change(self, serial, old_state, new_state):
+        """
+        Called by the device watcher whenever a device connects, disconnects
+        or changes state. Drops per-device caches that are no longer valid.
+        """
+        if new_state != 'device':
+            logger.warning(f"Device {serial} is no longer available ({new_state})")
+            # Commands without an explicit serial target the only attached device
+            for key in (serial, None):
+                self.shell_pool.close_device(key)
+                self.package_index.invalidate(key)
+                self.launch_cache.clear(key)
+                self.ui_locator.invalidate(key)
+                self.text_entry.forget_device(key)
+        else:
+            logger.info(f"Device {serial} connected")
+
     def verify_device_connection(self):
         """
         Verify that at least one Android device is connected
@@ -168,6 +296,14 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         Returns:
             bool: True if connected, False otherwise
         """
+        # Read the live state table kept by the device watcher
+        if self.device_watcher.wait_ready(timeout=2):
+            if self.device_watcher.is_connected(self.current_serial()):
+                return True
+            logger.warning("No Android devices connected")
+            return False
+
+        # Watcher has no data yet; fall back to asking adb directly
         try:
             result = subprocess.run(
                 [self.adb_path, 'devices'], 
@@ -209,44 +345,20 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
                     command = self.recognizer.recognize_google(audio).lower()
                     logger.info(f"Recognized command: {command}")
 
-                    # Categorize the command using FirstLayerDMM
-                    try:
-                        categorized_commands = FirstLayerDMM(command)
-                        logger.info(f"Categorized commands: {categorized_commands}")
-                        
-                        # Extract the first category (default behavior)
-                        category = categorized_commands[0]
-                        category_type = category.split()[0]
-                        query = " ".join(category.split()[1:])
-
-                        # Handle real-time queries immediately
-                        if category_type == 'realtime':
-                            answer = RealtimeSearchEngine(query)
-                            self.speak(answer)
-                            continue  # Skip adding to the queue for real-time queries
-
-                        # Handle special commands (exit, quit, stop)
-                        if command == 'exit' or command == 'quit' or command == 'stop':
-                            self.speak("Shutting down.")
-                            os._exit(0)  # Forcefully exit the program
-
-                        # Add the categorized command to the queue
-                        self.command_queue.put({
-                            'raw_command': command,
-                            'category_type': category_type,
-                            'query': query
-                        })
-                        logger.info(f"Added command to queue: {command}. Queue size: approximately {self.command_queue.qsize()}")
-
-                    except Exception as e:
-                        logger.error(f"Command categorization error: {e}")
-                        # Fallback to adding the raw command to the queue
-                        self.command_queue.put({
-                            'raw_command': command,
-                            'category_type': 'general',
-                            'query': command
-                        })
-                        logger.info(f"Added raw command to queue: {command}. Queue size: approximately {self.command_queue.qsize()}")
+                    # Handle special commands (exit, quit, stop)
+                    if command == 'exit' or command == 'quit' or command == 'stop':
+                        self.speak("Shutting down.")
+                        os._exit(0)  # Forcefully exit the program
+
+                    # Categorize the command once, queueing each task as soon as the model has written it
+                    for classified in self.task_scheduler.pin(self.process_command(command)):
+                        # Start the web search for answer tasks now, while earlier tasks are still running
+                        if not is_device_task(classified) and classified.context is None:
+                            classified = classified._replace(
+                                context=PrefetchContext(classified.query, classified.category_type)
+                            )
+                        self.command_queue.put(classified)
+                        logger.info(f"Added command to queue: {classified}. Queue size: approximately {self.command_queue.qsize()}")
 
                 except sr.UnknownValueError:
                     self.speak("Sorry, I didn't catch that. Could you repeat?")
@@ -261,81 +373,183 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         """
         Speak the given text while preventing multiple threads from interfering.
         """
-        def _speak():
-            with self.speak_lock:  # Lock to prevent multiple runAndWait() calls
+        if not self.enable_voice:
+            logger.info(f"Speaking (voice disabled): {text}")
+            return
+
+        # Queue the text; one thread speaks everything in order, so the
+        # sentences of a streamed answer are never reordered
+        self.speech_queue.put(text)
+        with self.speak_lock:
+            if self.speech_thread is None or not self.speech_thread.is_alive():
+                self.speech_thread = threading.Thread(target=self._speech_loop, daemon=True, name="speech")
+                self.speech_thread.start()
+
+    def _speech_loop(self):
+        while True:
+            text = self.speech_queue.get()
+            try:
                 logger.info(f"Speaking: {text}")
                 self.tts_engine.say(text)
                 self.tts_engine.runAndWait()
+            except Exception as e:
+                logger.error(f"Text-to-speech error: {e}")
+            finally:
+                self.speech_queue.task_done()
 
-        threading.Thread(target=_speak, daemon=True).start()
+    def stream_answer(self, query, category_type, context=None):
+        """
+        Answer an LLM task, yielding the answer text as it is generated.
+        
+        Each sentence is spoken as soon as it is complete, so speech starts
+        long before the whole answer has been generated.
+        
+        :param query: Question to answer
+        :param category_type: 'general', 'realtime', 'google search' or 'youtube search'
+        :param context: Prefetched search results, if any
+        :return: Generator of answer text chunks
+        """
+        pending = ""
+        for chunk in RealtimeSearchEngineStream(query, category_type, context):
+            pending += chunk
+            sentences, pending = SplitSentences(pending)
+            for sentence in sentences:
+                self.speak(sentence)
+            yield chunk
+        if pending.strip():
+            self.speak(pending.strip())
+
+    def answer(self, query, category_type, context=None):
+        """
+        Answer an LLM task, speaking it sentence by sentence.
+        
+        :return: The complete answer text
+        """
+        return AnswerModifier("".join(self.stream_answer(query, category_type, context)).strip())
 
     def process_command(self, command):
         """
         Process and interpret the voice command using the FirstLayerDMM model.
         
-        :param command: Voice command string
-        :return: Structured command interpretation
+        Raw text is classified exactly once; commands that are already
+        classified pass through unchanged. Tasks are yielded as the model
+        writes them.
+        
+        :param command: Voice command string, ClassifiedCommand, or dict
+                        with 'raw_command' and optionally 'category_type',
+                        'query', 'serial' and 'tag'
+        :return: Generator of ClassifiedCommand
         """
+        if isinstance(command, ClassifiedCommand):
+            yield command
+            return
+
+        serial = tag = None
+        if isinstance(command, dict):
+            serial, tag = command.get('serial'), command.get('tag')
+            if command.get('category_type'):
+                yield ClassifiedCommand(
+                    command.get('raw_command', ''), command['category_type'],
+                    command.get('query', ''), serial, tag
+                )
+                return
+            command = command.get('raw_command', '')
+
+        produced = 0
         try:
-            # Use FirstLayerDMM to categorize the command
-            categorized_commands = FirstLayerDMM(command)
-            logger.info(f"Categorized commands: {categorized_commands}")
-            
-            # Extract the first category (default behavior)
-            category = categorized_commands[0]
-            
-            # Split the category into type and query
-            category_type = category.split()[0]
-            query = " ".join(category.split()[1:])
-            
-            return {
-                'raw_command': command,
-                'category_type': category_type,
-                'query': query
-            }
+            for classified in ClassifyStream(command, serial=serial, tag=tag):
+                produced += 1
+                logger.info(f"Categorized command: {classified}")
+                yield classified
         except Exception as e:
             logger.error(f"Command categorization error: {e}")
-            return {
-                'raw_command': command,
-                'category_type': 'general',
-                'query': command
-            }
+            # Fall back to a general query if no task made it through
+            if not produced:
+                yield ClassifiedCommand(command, 'general', command, serial, tag)
 
     def execute_android_command(self, command):
         """
         Execute Android-specific commands based on the categorized command.
         
+        A ClassifiedCommand is executed directly. Raw text is classified
+        once and every task is handed to the task scheduler as soon as the
+        model has written it, so independent tasks run concurrently.
+        
         :param command: Voice command to execute
-        :return: Command execution result
+        :return: Command execution result, or a list of per-task results for several tasks
         """
         try:
-            # Verify device connection
-            if not self.verify_device_connection():
-                self.speak("No Android device connected. Please connect a device and try again.")
-                return None
-                
-            processed_cmd = self.process_command(command)
-            logger.info(f"Processed command: {processed_cmd}")
+            if isinstance(command, ClassifiedCommand):
+                return self.run_task(command)
 
-            if not processed_cmd:
+            results = self.task_scheduler.run(self.process_command(command))
+            if not results:
                 self.speak("Sorry, I couldn't understand.")
                 return None
+            return aggregate_results(results)
+
+        except Exception as e:
+            logger.error(f"Error executing command: {e}")
+            self.speak("An error occurred while processing the command.")
+            return None
 
-            category_type = processed_cmd.get('category_type')
-            query = processed_cmd.get('query')
+    def run_task(self, command):
+        """
+        Execute one ClassifiedCommand, checking the device first for device tasks.
+        
+        :param command: ClassifiedCommand
+        :return: Task execution result
+        """
+        logger.info(f"Processed command: {command}")
+        if is_device_task(command) and not self.verify_device_connection():
+            self.speak("No Android device connected. Please connect a device and try again.")
+            return None
+        return self.execute_task(command.category_type, command.query, command.context)
+
+    async def run_llm_task(self, command):
+        """
+        Answer an LLM task (general, realtime, google or youtube search) as a
+        coroutine on the shared LLM event loop.
+        
+        :param command: ClassifiedCommand
+        :return: Answer text
+        """
+        logger.info(f"Processed command: {command}")
+        try:
+            # Speak each sentence as soon as the model has finished it
+            answer = pending = ""
+            async for chunk in RealtimeSearchEngineStreamAsync(command.query, command.category_type, command.context):
+                answer += chunk
+                pending += chunk
+                sentences, pending = SplitSentences(pending)
+                for sentence in sentences:
+                    self.speak(sentence)
+            if pending.strip():
+                self.speak(pending.strip())
+            return AnswerModifier(answer.strip())
+        except Exception as e:
+            logger.error(f"Error executing task {command.category_type} {command.query}: {e}")
+            self.speak("An error occurred while processing the command.")
+            return None
 
+    def execute_task(self, category_type, query, context=None):
+        """
+        Execute a single classified task.
+        
+        :param category_type: Function keyword, e.g. 'open' or 'google search'
+        :param query: Rest of the task
+        :param context: Prefetched search results for answer tasks, if any
+        :return: Task execution result
+        """
+        try:
             # Handle different categories
             if category_type == 'general':
-                # Use the RealtimeSearchEngine to handle general queries
-                answer = RealtimeSearchEngine(query)
-                self.speak(answer)
-                return answer
+                # Answer general queries, speaking as the answer is generated
+                return self.answer(query, category_type, context)
 
             elif category_type == 'realtime':
-                # Use the RealtimeSearchEngine to handle real-time queries
-                answer = RealtimeSearchEngine(query)
-                self.speak(answer)
-                return answer
+                # Answer real-time queries, speaking as the answer is generated
+                return self.answer(query, category_type, context)
 
             elif category_type == 'open':
                 # Extract the app name from the query and open it
@@ -380,16 +594,12 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
                 return None
 
             elif category_type == 'google search':
-                # Perform a Google search
-                answer = RealtimeSearchEngine(query)
-                self.speak(answer)
-                return answer
+                # Answer from a Google search
+                return self.answer(query, category_type, context)
 
             elif category_type == 'youtube search':
-                # Perform a YouTube search
-                answer = RealtimeSearchEngine(query)
-                self.speak(answer)
-                return answer
+                # Answer from a YouTube search
+                return self.answer(query, category_type, context)
 
             elif category_type == 'exit':
                 # Handle exit command
@@ -402,7 +612,7 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
                 return None
 
         except Exception as e:
-            logger.error(f"Error executing command: {e}")
+            logger.error(f"Error executing task {category_type} {query}: {e}")
             self.speak("An error occurred while processing the command.")
             return None
 
@@ -410,40 +620,208 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         """
         Take a screenshot on the connected Android device.
         
-        :return: Path to the saved screenshot or None if failed
+        :return: Path the screenshot is being written to in the background, or None if failed
         """
         try:
-            # Create screenshots directory if it doesn't exist
-            screenshots_dir = os.path.join(os.getcwd(), 'screenshots')
-            os.makedirs(screenshots_dir, exist_ok=True)
+            # Capture straight into memory over exec-out
+            logger.info("Capturing screenshot via exec-out")
+            frame = Frame(time.time(), capture_png(self.adb_path, self.current_serial()))
+            if self.screen_streamer and self.screen_streamer.is_running():
+                self.screen_streamer.buffer.append(frame)
 
             # Generate filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_path = os.path.join(screenshots_dir, f'screenshot_{timestamp}.png')
-
-            # Execute screenshot command
-            cmd = [self.adb_path, 'shell', 'screencap', '-p', '/sdcard/screenshot.png']
-            logger.info(f"Executing command: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
-
-            # Pull screenshot to local machine
-            pull_cmd = [self.adb_path, 'pull', '/sdcard/screenshot.png', screenshot_path]
-            logger.info(f"Executing command: {' '.join(pull_cmd)}")
-            result = subprocess.run(pull_cmd, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                self.speak(f"Screenshot taken and saved")
-                logger.info(f"Screenshot saved successfully: {screenshot_path}")
+            timestamp = datetime.fromtimestamp(frame.timestamp).strftime("%Y%m%d_%H%M%S")
+            screenshot_path = os.path.join(self.screenshot_sink.directory, f'screenshot_{timestamp}.png')
+
+            # Persist asynchronously; the file isn't written yet, so only report the capture
+            if self.screenshot_sink.submit(frame, screenshot_path):
+                self.speak("Screenshot taken")
+                logger.info(f"Screenshot queued for saving: {screenshot_path}")
                 return screenshot_path
             else:
                 self.speak("Failed to take screenshot")
-                logger.error(f"Error saving screenshot: {result.stderr}")
+                logger.error("Error saving screenshot: writer queue is full")
                 return None
         except Exception as e:
             logger.error(f"Screenshot error: {e}")
             self.speak("An error occurred while taking the screenshot.")
             return None
 
+    def capture_screen(self):
+        """
+        Capture the screen into memory without saving it.
+        
+        :return: PNG image bytes
+        """
+        return capture_png(self.adb_path, self.current_serial())
+
+    def start_screen_stream(self, fps=1.0, buffer_size=10, save_frames=False):
+        """
+        Start continuous screen capture into a ring buffer of recent frames.
+        
+        :param fps: Captures per second
+        :param buffer_size: Number of recent frames to keep
+        :param save_frames: Also write every frame to the screenshots directory
+        :return: The running ScreenStreamer
+        """
+        self.stop_screen_stream()
+        sink = self.screenshot_sink if save_frames else None
+        self.screen_streamer = ScreenStreamer(
+            self.adb_path, self.current_serial(), fps=fps, buffer_size=buffer_size, sink=sink
+        )
+        self.screen_streamer.start()
+        return self.screen_streamer
+
+    def stop_screen_stream(self):
+        """Stop continuous screen capture if it is running."""
+        if self.screen_streamer:
+            self.screen_streamer.stop()
+
+    def latest_frame(self):
+        """
+        Return the most recent streamed frame without a device round trip.
+        
+        :return: Frame or None if streaming has not produced one yet
+        """
+        if self.screen_streamer:
+            return self.screen_streamer.buffer.latest()
+        return None
+
+    def find_elements(self, refresh=False, **query):
+        """
+        Find elements on the current screen using the view hierarchy.
+        
+        :param refresh: Fetch a fresh hierarchy instead of using the cache
+        :param query: resource_id, text, content_desc, contains, clickable
+        :return: List of matching UiElements
+        """
+        try:
+            return self.ui_locator.tree(self.current_serial(), refresh).find_all(**query)
+        except Exception as e:
+            logger.error(f"UI hierarchy lookup failed: {e}")
+            return []
+
+    def find_element(self, refresh=False, **query):
+        """
+        Find the first element on the current screen matching the query.
+        
+        :return: UiElement or None if not found
+        """
+        elements = self.find_elements(refresh, **query)
+        return elements[0] if elements else None
+
+    def tap_element(self, **query):
+        """
+        Tap the center of the first element matching the query.
+        
+        :return: True if an element was found and tapped
+        """
+        element = self.find_element(**query)
+        if element is None:
+            return False
+        logger.info(f"Tapping element {element}")
+        x, y = element.center
+        return self.adb_tap(x, y)
+
+    def get_focused_activity(self):
+        """
+        Read the focused window's component from `dumpsys window`.
+        
+        :return: "package/activity" string, or None if it couldn't be read
+        """
+        returncode, output = self.adb_shell(
+            'dumpsys', 'window', '|', 'grep', '-E', "'mCurrentFocus|mFocusedApp'", check=False
+        )
+        for line in output.splitlines():
+            match = COMPONENT_PATTERN.search(line)
+            if match:
+                return match.group(0)
+        return None
+
+    def is_keyboard_shown(self):
+        """
+        Check whether the soft keyboard is visible.
+        
+        :return: True if the input method window is shown
+        """
+        returncode, output = self.adb_shell(
+            'dumpsys', 'input_method', '|', 'grep', '-E', "'mInputShown|isInputViewShown'", check=False
+        )
+        return 'mInputShown=true' in output or 'isInputViewShown=true' in output
+
+    def wait_for_activity(self, package_or_component, timeout=10.0):
+        """
+        Wait until an app (or a specific activity) has focus.
+        
+        :param package_or_component: Package name or "package/activity"
+        :param timeout: Maximum seconds to wait
+        :return: The focused component, or None on timeout
+        """
+        def focused():
+            component = self.get_focused_activity()
+            if component and (component == package_or_component or component.startswith(f"{package_or_component}/")):
+                return component
+            return None
+
+        return wait_until(focused, timeout=timeout, description=f"{package_or_component} in focus")
+
+    def wait_for_element(self, queries, timeout=10.0):
+        """
+        Wait until an element matching any of the queries is on screen.
+        
+        :param queries: List of element queries, tried in order on each check
+        :param timeout: Maximum seconds to wait
+        :return: The first matching UiElement, or None on timeout
+        """
+        checks = 0
+
+        def present():
+            nonlocal checks
+            # The first check may use a cached hierarchy; later ones must re-dump
+            refresh = checks > 0
+            checks += 1
+            for query in queries:
+                element = self.find_element(refresh, **query)
+                refresh = False
+                if element:
+                    return element
+            return None
+
+        return wait_until(present, timeout=timeout, initial_interval=0.2, description=f"element {queries}")
+
+    def wait_for_keyboard(self, shown=True, timeout=5.0):
+        """
+        Wait until the soft keyboard is shown (or hidden).
+        
+        :return: True if the keyboard reached the requested state in time
+        """
+        state = "shown" if shown else "hidden"
+        return bool(wait_until(lambda: self.is_keyboard_shown() == shown, timeout=timeout,
+                               description=f"keyboard {state}"))
+
+    def _tap_first(self, queries, fallback_positions, timeout=5.0):
+        """
+        Wait for an element matching any of the queries and tap it, falling
+        back to sweeping hardcoded coordinates if none appears in time.
+        
+        :param queries: List of element queries, tried in order
+        :param fallback_positions: (x, y) positions to tap if nothing matched
+        :param timeout: Maximum seconds to wait for an element to appear
+        :return: True if a located element was tapped
+        """
+        if queries:
+            element = self.wait_for_element(queries, timeout=timeout)
+            if element:
+                logger.info(f"Tapping element {element}")
+                x, y = element.center
+                return self.adb_tap(x, y)
+
+        logger.info("No matching element found, trying hardcoded positions")
+        for x, y in fallback_positions:
+            self.adb_tap(x, y)
+            time.sleep(1)
+        return False
+
     def initiate_google_pay_transaction(self, recipient, amount):
         """
         Initiate a Google Pay transaction using ADB commands.
@@ -454,53 +832,76 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         """
         try:
             # Open Google Pay
-            self.open_app(self.app_packages['google pay'], 'Google Pay')
+            package = self.app_packages['google pay']
+            self.open_app(package, 'Google Pay')
             logger.info("Opened Google Pay")
 
-            # Wait for the app to load
-            time.sleep(5)
+            # Wait for the app to come to the foreground
+            self.wait_for_activity(package, timeout=10)
 
-            # Navigate to "Send Money" section - try multiple potential coordinates
+            # Navigate to "Send Money" section
             logger.info("Navigating to Send Money section")
-            # Different devices might have the UI elements in different positions
-            # Try a few common positions
-            potential_send_money_positions = [(500, 1000), (500, 800), (300, 1200)]
-            for x, y in potential_send_money_positions:
-                self.adb_tap(x, y)
-                time.sleep(1)
+            # Different devices might have the UI elements in different positions,
+            # so the coordinates are only used if the element can't be located
+            self._tap_first(
+                [
+                    {'text': 'Send money', 'contains': True},
+                    {'text': 'New payment', 'contains': True},
+                    {'text': 'Pay phone number', 'contains': True},
+                    {'content_desc': 'Search', 'contains': True},
+                ],
+                [(500, 1000), (500, 800), (300, 1200)],
+                timeout=10
+            )
             
-            # Wait for the recipient field to appear
-            time.sleep(2)
+            # Wait for the recipient field to take focus
+            self.wait_for_keyboard(timeout=5)
 
             # Enter recipient
             logger.info(f"Entering recipient: {recipient}")
             self.adb_input_text(recipient)
-            time.sleep(2)
 
-            # Tap on what would likely be the first suggestion
-            potential_contact_positions = [(500, 300), (300, 400), (400, 350)]
-            for x, y in potential_contact_positions:
+            # Tap the matching contact rather than the search field itself
+            def matching_contact():
+                return next((
+                    element for element in self.find_elements(refresh=True, text=recipient, contains=True)
+                    if not element.class_name.endswith('EditText')
+                ), None)
+
+            contact = wait_until(matching_contact, timeout=5, initial_interval=0.2, description="contact suggestion")
+            if contact:
+                x, y = contact.center
                 self.adb_tap(x, y)
-                time.sleep(1)
+            else:
+                self._tap_first([], [(500, 300), (300, 400), (400, 350)])
 
-            # Enter amount
+            # Enter amount once the amount field has focus
+            self.wait_for_keyboard(timeout=5)
             logger.info(f"Entering amount: {amount}")
             # Clean the amount string from any currency symbols
             clean_amount = re.sub(r'[^\d.]', '', amount.split()[0])
             self.adb_input_text(clean_amount)
-            time.sleep(2)
 
-            # Try various positions for "Pay" or "Send" button
-            pay_button_positions = [(500, 1500), (500, 1300), (300, 1400)]
-            for x, y in pay_button_positions:
-                self.adb_tap(x, y)
-                time.sleep(1)
+            # "Pay" or "Send" button
+            self._tap_first(
+                [
+                    {'text': 'Pay', 'clickable': True},
+                    {'text': 'Proceed to pay', 'contains': True},
+                    {'text': 'Send', 'clickable': True},
+                    {'content_desc': 'Pay', 'contains': True},
+                ],
+                [(500, 1500), (500, 1300), (300, 1400)]
+            )
 
-            # Try various positions for confirmation buttons
-            confirm_positions = [(500, 1200), (500, 1000), (300, 1100)]
-            for x, y in confirm_positions:
-                self.adb_tap(x, y)
-                time.sleep(1)
+            # Confirmation button
+            self._tap_first(
+                [
+                    {'text': 'Confirm', 'contains': True},
+                    {'text': 'Proceed', 'contains': True},
+                    {'text': 'Pay', 'clickable': True},
+                ],
+                [(500, 1200), (500, 1000), (300, 1100)]
+            )
 
             self.speak(f"I've attempted to send {amount} to {recipient}. Please check if the transaction was successful.")
             return True
@@ -520,48 +921,55 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         """
         try:
             # Open Google Calendar
-            self.open_app(self.app_packages['calendar'], 'Google Calendar')
+            package = self.app_packages['calendar']
+            self.open_app(package, 'Google Calendar')
             logger.info("Opened Google Calendar")
 
-            # Wait for the app to load
-            time.sleep(5)
+            # Wait for the app to come to the foreground
+            self.wait_for_activity(package, timeout=10)
 
-            # Try various positions for "Create" or "+" button
-            create_positions = [(500, 1600), (500, 1500), (300, 1600), (900, 1600)]
+            # "Create" or "+" button
             logger.info("Attempting to create new event")
-            for x, y in create_positions:
-                self.adb_tap(x, y)
-                time.sleep(1)
+            self._tap_first(
+                [
+                    {'content_desc': 'Create new event', 'contains': True},
+                    {'resource_id': 'floating_action_button'},
+                    {'content_desc': 'Create', 'contains': True},
+                ],
+                [(500, 1600), (500, 1500), (300, 1600), (900, 1600)],
+                timeout=10
+            )
 
-            # Try to find and tap the "Event" option (if there's a menu)
-            event_positions = [(500, 700), (500, 800), (500, 600)]
-            for x, y in event_positions:
-                self.adb_tap(x, y)
-                time.sleep(1)
+            # "Event" option (only some versions show a menu)
+            self._tap_first(
+                [{'text': 'Event'}, {'content_desc': 'Event button'}],
+                [(500, 700), (500, 800), (500, 600)],
+                timeout=3
+            )
 
             # Enter event name
             logger.info(f"Entering event name: {event_name}")
+            self._tap_first([{'text': 'Add title', 'contains': True}], [], timeout=5)
+            self.wait_for_keyboard(timeout=5)
             self.adb_input_text(event_name)
-            time.sleep(2)
 
-            # Try to find and tap date field
-            date_field_positions = [(500, 900), (500, 1000), (500, 800)]
-            for x, y in date_field_positions:
-                self.adb_tap(x, y)
-                time.sleep(1)
+            # Date field
+            self._tap_first(
+                [{'resource_id': 'start_date'}, {'content_desc': 'Start date', 'contains': True}],
+                [(500, 900), (500, 1000), (500, 800)]
+            )
 
             # Clear existing text and enter event date
             self.adb_key_event(67)  # Delete key to clear
             self.adb_key_event(67)  # Multiple times to ensure clearing
             logger.info(f"Entering event date: {event_date}")
             self.adb_input_text(event_date)
-            time.sleep(2)
 
-            # Try to find and tap save button
-            save_positions = [(900, 100), (800, 200), (700, 100)]
-            for x, y in save_positions:
-                self.adb_tap(x, y)
-                time.sleep(1)
+            # Save button
+            self._tap_first(
+                [{'text': 'Save', 'clickable': True}, {'resource_id': 'save'}, {'text': 'Save'}],
+                [(900, 100), (800, 200), (700, 100)]
+            )
 
             self.speak(f"I've attempted to schedule '{event_name}' on {event_date}. Please check your calendar.")
             return True
@@ -579,9 +987,10 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         :param y: Y coordinate
         """
         try:
-            cmd = [self.adb_path, 'shell', 'input', 'tap', str(x), str(y)]
-            logger.info(f"Executing command: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
+            cmd = ['input', 'tap', str(x), str(y)]
+            logger.info(f"Executing shell command: {' '.join(cmd)}")
+            self.adb_shell(*cmd)
+            self._record('tap', x, y)
             return True
         except Exception as e:
             logger.error(f"Tap error at ({x}, {y}): {e}")
@@ -594,9 +1003,10 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         :param key_code: Android key code
         """
         try:
-            cmd = [self.adb_path, 'shell', 'input', 'keyevent', str(key_code)]
-            logger.info(f"Executing command: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
+            cmd = ['input', 'keyevent', str(key_code)]
+            logger.info(f"Executing shell command: {' '.join(cmd)}")
+            self.adb_shell(*cmd)
+            self._record('key', key_code)
             return True
         except Exception as e:
             logger.error(f"Key event error ({key_code}): {e}")
@@ -606,36 +1016,128 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         """
         Simulate text input using ADB.
         
+        Uses the fastest text entry mode that works on the device (IME
+        broadcast, clipboard paste, chunked `input text` or per-character
+        input) and remembers it for the next call.
+        
         :param text: Text to input
         """
         try:
-            # Escape special characters for different platforms
-            if sys.platform == 'win32':
-                # Windows needs different escaping
-                escaped_text = text.replace(' ', '%s')
-            else:
-                escaped_text = re.sub(r'(["\'\s])', r'\\\1', text)
-                
-            cmd = [self.adb_path, 'shell', 'input', 'text', escaped_text]
-            logger.info(f"Executing command: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
+            logger.info(f"Entering text: {text}")
+            mode = self.text_entry.enter_text(text, self.current_serial())
+            if mode is None:
+                logger.error("Text input failed with every entry mode")
+                return False
+            self._record('text', text)
             return True
         except Exception as e:
             logger.error(f"Text input error: {e}")
-            # Try alternate method for text input (character by character)
-            try:
-                logger.info("Trying character-by-character input as fallback")
-                for char in text:
-                    if char == ' ':
-                        char_cmd = [self.adb_path, 'shell', 'input', 'text', '%s']
-                    else:
-                        char_cmd = [self.adb_path, 'shell', 'input', 'text', char]
-                    subprocess.run(char_cmd, check=True)
-                    time.sleep(0.1)  # Small delay between characters
-                return True
-            except Exception as inner_e:
-                logger.error(f"Character-by-character input failed: {inner_e}")
-                return False
+            return False
+
+    def new_batch(self, name=None):
+        """
+        Create an empty action batch.
+        
+        :param name: Optional macro name
+        :return: ActionBatch to add taps, keys, text and sleeps to
+        """
+        return ActionBatch(name)
+
+    def run_batch(self, batch, stop_on_error=True):
+        """
+        Run a whole action batch as a single shell invocation.
+        
+        :param batch: ActionBatch to execute
+        :param stop_on_error: Skip the remaining steps after a failing one
+        :return: List of per-step results (returncode None means skipped)
+        """
+        if not len(batch):
+            return []
+        script = batch.to_script(stop_on_error)
+        # Allow for on-device sleeps on top of the usual command timeout
+        timeout = self.shell_pool.timeout + batch.total_sleep + len(batch)
+        logger.info(f"Running action batch '{batch.name or 'unnamed'}' with {len(batch)} steps")
+        try:
+            returncode, output = self.adb_shell(script, check=False, timeout=timeout)
+        finally:
+            self.ui_locator.invalidate(self.current_serial())
+
+        results = batch.parse_results(output)
+        failed = [result for result in results if result['returncode'] not in (0, None)]
+        if failed:
+            logger.warning(f"Batch step failed: {failed[0]}")
+        return results
+
+    def start_recording(self, name, capture_timing=False):
+        """
+        Start recording taps, key events and text input into a macro.
+        
+        :param name: Macro name: letters, digits, '_' and '-'
+        :param capture_timing: Record the pauses between actions as on-device sleeps
+        :return: True if recording started, False for an invalid name
+        """
+        if self.macro_path(name) is None:
+            return False
+        with self.recording_lock:
+            self.recording = ActionBatch(name)
+            self.recording_capture_timing = capture_timing
+            self.last_recorded_at = None
+        logger.info(f"Recording macro '{name}'")
+        return True
+
+    def stop_recording(self, save=True):
+        """
+        Stop recording and optionally save the macro to the macros directory.
+        
+        :return: The recorded ActionBatch, or None if nothing was recording
+        """
+        with self.recording_lock:
+            batch, self.recording = self.recording, None
+        if batch is not None and save:
+            batch.save(self.macro_path(batch.name))
+        return batch
+
+    def macro_path(self, name):
+        """
+        :param name: Macro name
+        :return: Path of the macro file inside the macros directory, or None
+                 if the name could reach outside it
+        """
+        if not isinstance(name, str) or not MACRO_NAME_PATTERN.fullmatch(name):
+            logger.error(f"Invalid macro name: {name!r}")
+            return None
+        return os.path.join(self.macros_dir, f"{name}.json")
+
+    def _record(self, action, *args):
+        """Append a primitive action to the macro being recorded, if any."""
+        with self.recording_lock:
+            if self.recording is None:
+                return
+            now = time.monotonic()
+            if self.recording_capture_timing and self.last_recorded_at is not None:
+                self.recording.sleep(round(now - self.last_recorded_at, 2))
+            self.last_recorded_at = now
+            getattr(self.recording, action)(*args)
+
+    def run_macro(self, name):
+        """
+        Replay a saved macro in one shell invocation.
+        
+        :param name: Macro name (file in the macros directory)
+        :return: List of per-step results, or None if the macro doesn't exist or is invalid
+        """
+        path = self.macro_path(name)
+        if path is None:
+            return None
+        if not os.path.exists(path):
+            logger.error(f"Macro not found: {name}")
+            return None
+        try:
+            batch = ActionBatch.load(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Refusing to run macro {name}: {e}")
+            return None
+        return self.run_batch(batch)
 
     def open_app(self, app_package, app_name=None):
         """
@@ -647,49 +1149,39 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         """
         try:
             display_name = app_name or app_package
+            serial = self.current_serial()
             
-            # Check if app is installed
-            check_cmd = [self.adb_path, 'shell', 'pm', 'list', 'packages', app_package]
-            logger.info(f"Checking if app is installed: {' '.join(check_cmd)}")
-            check_result = subprocess.run(check_cmd, capture_output=True, text=True)
-            
-            app_installed = False
-            # Check if package is in the output
-            if app_package in check_result.stdout:
-                app_installed = True
-            else:
-                # Try a more flexible search (partial package match)
-                packages_list = subprocess.run(
-                    [self.adb_path, 'shell', 'pm', 'list', 'packages'], 
-                    capture_output=True, 
-                    text=True
-                )
-                
-                # Extract package names from output
-                packages = [line.replace("package:", "").strip() for line in packages_list.stdout.splitlines()]
-                
-                # Find closest matching package
-                matching_packages = [pkg for pkg in packages if app_package in pkg]
-                if matching_packages:
-                    app_package = matching_packages[0]
-                    app_installed = True
-                    logger.info(f"Found similar package: {app_package}")
-            
-            if not app_installed:
+            # Check if app is installed using the cached package index
+            resolved_package = self.package_index.resolve(app_package, serial)
+            if not resolved_package:
                 self.speak(f"The app {display_name} doesn't seem to be installed on the device.")
                 logger.warning(f"App not installed: {app_package}")
                 return None
+            app_package = resolved_package
+            
+            # Fast path: reuse the launch method that worked last time
+            cached_launch = self.launch_cache.get(app_package, serial)
+            if cached_launch:
+                method, target = cached_launch
+                logger.info(f"Using cached launch method for {app_package}: {method} {target}")
+                if self._launch_component(target):
+                    self.speak(f"Opening {display_name}")
+                    return True
+                logger.info("Cached launch failed, retrying full launch sequence")
+                self.launch_cache.forget(app_package, serial)
+                self.package_index.invalidate(serial)
             
             # Try multiple methods to open the app
             success = False
+            launched_component = None
             
             # Method 1: Using monkey
             try:
-                monkey_cmd = [self.adb_path, 'shell', 'monkey', '-p', app_package, '-c', 'android.intent.category.LAUNCHER', '1']
+                monkey_cmd = ['monkey', '-p', app_package, '-c', 'android.intent.category.LAUNCHER', '1']
                 logger.info(f"Trying to open app with monkey: {' '.join(monkey_cmd)}")
-                result = subprocess.run(monkey_cmd, capture_output=True, text=True)
+                returncode, output = self.adb_shell(*monkey_cmd, check=False)
                 
-                if "No activities found to run" not in result.stdout and "No activities found" not in result.stderr:
+                if "No activities found" not in output:
                     success = True
                 else:
                     logger.info("Monkey launch failed, trying alternate methods")
@@ -700,12 +1192,9 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
             if not success:
                 try:
                     # Try default MainActivity first
-                    main_activity_cmd = [self.adb_path, 'shell', 'am', 'start', '-n', f"{app_package}/.MainActivity"]
-                    logger.info(f"Trying to open app with main activity: {' '.join(main_activity_cmd)}")
-                    result = subprocess.run(main_activity_cmd, capture_output=True, text=True)
-                    
-                    if result.returncode == 0 and "Error" not in result.stdout:
+                    if self._launch_component(f"{app_package}/.MainActivity"):
                         success = True
+                        launched_component = f"{app_package}/.MainActivity"
                     else:
                         logger.info("Main activity launch failed, trying more generic approach")
                 except Exception as e:
@@ -714,11 +1203,11 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
             # Method 3: Using am start without specific activity
             if not success:
                 try:
-                    start_cmd = [self.adb_path, 'shell', 'am', 'start', '-a', 'android.intent.action.MAIN', '-c', 'android.intent.category.LAUNCHER', '-n', f"{app_package}/"]
+                    start_cmd = ['am', 'start', '-a', 'android.intent.action.MAIN', '-c', 'android.intent.category.LAUNCHER', '-n', f"{app_package}/"]
                     logger.info(f"Trying generic app launch: {' '.join(start_cmd)}")
-                    result = subprocess.run(start_cmd, capture_output=True, text=True)
+                    returncode, output = self.adb_shell(*start_cmd, check=False)
                     
-                    if "Error" not in result.stdout:
+                    if "Error" not in output:
                         success = True
                 except Exception as e:
                     logger.error(f"Generic launch error: {e}")
@@ -727,24 +1216,29 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
             if not success:
                 try:
                     # Get package info to find main activity
-                    dumpsys_cmd = [self.adb_path, 'shell', 'dumpsys', 'package', app_package]
+                    dumpsys_cmd = ['dumpsys', 'package', app_package]
                     logger.info(f"Getting package info: {' '.join(dumpsys_cmd)}")
-                    dumpsys_result = subprocess.run(dumpsys_cmd, capture_output=True, text=True)
+                    returncode, output = self.adb_shell(*dumpsys_cmd, check=False)
                     
                     # Extract main activity
-                    activity_pattern = re.compile(fr'{app_package}/[\w\.]+Activity')
-                    activities = activity_pattern.findall(dumpsys_result.stdout)
+                    activity_pattern = re.compile(fr'{re.escape(app_package)}/[\w\.]+Activity')
+                    activities = activity_pattern.findall(output)
                     
                     if activities:
                         main_activity = activities[0]
-                        launch_cmd = [self.adb_path, 'shell', 'am', 'start', '-n', main_activity]
+                        launch_cmd = ['am', 'start', '-n', main_activity]
                         logger.info(f"Launching found activity: {' '.join(launch_cmd)}")
-                        subprocess.run(launch_cmd)
+                        self.adb_shell(*launch_cmd, check=False)
                         success = True
+                        launched_component = main_activity
                 except Exception as e:
                     logger.error(f"Activity search error: {e}")
             
             if success:
+                # Remember the component so the next launch is a single am start
+                component = launched_component or self._resolve_launch_component(app_package)
+                if component:
+                    self.launch_cache.remember(app_package, 'am start', component, serial)
                 self.speak(f"Opening {display_name}")
                 return True
             else:
@@ -756,6 +1250,39 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
             self.speak(f"Failed to open {display_name}")
             return False
 
+    def _launch_component(self, component):
+        """
+        Start an activity by its component name.
+        
+        :param component: Component in "package/activity" form
+        :return: True if the activity was started
+        """
+        cmd = ['am', 'start', '-n', component]
+        logger.info(f"Launching activity: {' '.join(cmd)}")
+        returncode, output = self.adb_shell(*cmd, check=False)
+        return returncode == 0 and "Error" not in output
+
+    def _resolve_launch_component(self, app_package):
+        """
+        Ask the package manager for the launcher activity of a package.
+        
+        :param app_package: Package name of the app
+        :return: Component name, or None if it could not be resolved
+        """
+        try:
+            returncode, output = self.adb_shell(
+                'cmd', 'package', 'resolve-activity', '--brief',
+                '-c', 'android.intent.category.LAUNCHER', app_package,
+                check=False
+            )
+            # The component is printed on the last line as "package/activity"
+            lines = [line.strip() for line in output.splitlines() if line.strip()]
+            if returncode == 0 and lines and lines[-1].startswith(f"{app_package}/"):
+                return lines[-1]
+        except Exception as e:
+            logger.debug(f"Could not resolve launch activity for {app_package}: {e}")
+        return None
+
     def navigate_home(self):
         """
         Navigate to the home screen.
@@ -763,9 +1290,9 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         :return: Command execution result
         """
         try:
-            cmd = [self.adb_path, 'shell', 'input', 'keyevent', '3']  # KEYCODE_HOME
+            cmd = ['input', 'keyevent', '3']  # KEYCODE_HOME
             logger.info(f"Navigating to home: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
+            self.adb_shell(*cmd)
             self.speak("Going to home screen")
             return True
         except Exception as e:
@@ -780,9 +1307,9 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
         :return: Command execution result
         """
         try:
-            cmd = [self.adb_path, 'shell', 'input', 'keyevent', '4']  # KEYCODE_BACK
+            cmd = ['input', 'keyevent', '4']  # KEYCODE_BACK
             logger.info(f"Navigating back: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
+            self.adb_shell(*cmd)
             self.speak("Going back")
             return True
         except Exception as e:
@@ -805,9 +1332,9 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
                 key_code = '25'  # KEYCODE_VOLUME_DOWN
                 message = "Decreasing volume"
                 
-            cmd = [self.adb_path, 'shell', 'input', 'keyevent', key_code]
+            cmd = ['input', 'keyevent', key_code]
             logger.info(f"Adjusting volume {direction}: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
+            self.adb_shell(*cmd)
             self.speak(message)
             return True
         except Exception as e:
@@ -835,6 +1362,92 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
             logger.error(f"Failed to start listening thread: {e}")
             return False
 
+    def dispatch_command(self, command, serial=None, tag=None):
+        """
+        Start a command in the background.
+        
+        Device tasks run on the worker of their phone; other tasks run on
+        the task scheduler's thread pool.
+        
+        :param command: Command string, dict or ClassifiedCommand; a dict or
+                        ClassifiedCommand may carry a serial or tag
+        :param serial: Route to this device
+        :param tag: Route to the least-busy device with this tag
+        :return: Future resolving to the command execution result
+        """
+        if isinstance(command, ClassifiedCommand):
+            # Already classified: start just this task
+            if serial or tag:
+                command = command._replace(serial=serial or command.serial, tag=tag or command.tag)
+            return self.task_scheduler.submit_task(command)
+        # Raw text: classify once and run every task it contains
+        return self.task_scheduler.submit(self.process_command(command), serial=serial, tag=tag)
+
+    def stream_command(self, command, serial=None, tag=None, timeout=60):
+        """
+        Execute a command, reporting progress as it happens.
+        
+        The command is classified to the end first, starting each device
+        task on its phone as soon as it is classified. Answers are then
+        streamed piece by piece while those tasks run, so an answer never
+        holds up a device task and a compound request still takes about as
+        long as its slowest task. Final tasks such as 'exit' start after
+        everything else.
+        
+        :param command: Command string
+        :param serial: Route device tasks to this device
+        :param tag: Route device tasks to the least-busy device with this tag
+        :param timeout: Seconds to wait for the results of device tasks
+        :return: Generator of (event, data) pairs, each data with the task's
+                 'index': ('task', task) when a task is classified,
+                 ('token', {'text': ...}) for each piece of an answer, and
+                 ('result', {'result': ..., 'error': ...}) when a task has finished
+        """
+        answers = []
+        running = []
+        final = []
+        index = -1
+        for index, classified in enumerate(self.task_scheduler.pin(self.process_command(command), serial, tag)):
+            yield 'task', {'index': index, 'category_type': classified.category_type,
+                           'query': classified.query, 'serial': classified.serial}
+            if classified.category_type in LLM_CATEGORIES:
+                answers.append((index, classified))
+            elif classified.category_type in FINAL_CATEGORIES:
+                final.append((index, classified))
+            else:
+                running.append((index, self.dispatch_command(classified)))
+
+        for task_index, classified in answers:
+            chunks = []
+            try:
+                for chunk in self.stream_answer(classified.query, classified.category_type, classified.context):
+                    chunks.append(chunk)
+                    yield 'token', {'index': task_index, 'text': chunk}
+                yield 'result', {'index': task_index, 'result': AnswerModifier("".join(chunks).strip()), 'error': None}
+            except Exception as e:
+                logger.error(f"Error answering {classified.query}: {e}")
+                yield 'result', {'index': task_index, 'result': None, 'error': str(e)}
+
+        deadline = time.monotonic() + timeout
+        for task_index, future in running:
+            try:
+                result = future.result(timeout=max(deadline - time.monotonic(), 0))
+                yield 'result', {'index': task_index, 'result': result, 'error': None}
+            except FutureTimeoutError:
+                yield 'result', {'index': task_index, 'result': None, 'error': f"Timed out after {timeout}s"}
+            except Exception as e:
+                yield 'result', {'index': task_index, 'result': None, 'error': str(e)}
+        for task_index, classified in final:
+            yield 'result', {'index': task_index, 'result': self.dispatch_command(classified).result(), 'error': None}
+        if index < 0:
+            self.speak("Sorry, I couldn't understand.")
+
+    def _log_command_result(self, future):
+        try:
+            logger.info(f"Command execution result: {future.result()}")
+        except Exception as e:
+            logger.error(f"Command execution failed: {e}")
+
     def command_processing_loop(self):
         """
         Process commands from the queue in a separate thread.
@@ -851,16 +1464,17 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
                 except queue.Empty:
                     continue
             
-                # Process and execute command
+                # Hand the command to a device worker so different devices run in parallel
                 logger.info(f"Processing command from queue: {command}")
-                result = self.execute_android_command(command)
-            
-                # Log the result for debugging
-                logger.info(f"Command execution result: {result}")
+                try:
+                    future = self.dispatch_command(command)
+                    future.add_done_callback(self._log_command_result)
+                except Exception as e:
+                    logger.error(f"Could not route command {command}: {e}")
             
                 # Mark as done
                 self.command_queue.task_done()
-                logger.info("Command processing completed. Ready for next command.")
+                logger.info("Command dispatched. Ready for next command.")
             
             except Exception as e:
                 logger.error(f"Error in command processing loop: {e}")
@@ -892,6 +1506,13 @@ Alternatively, provide ADB path explicitly when creating the agent instance.
             except KeyboardInterrupt:
                 print("\nShutting down Android AI Agent...")
                 self.speak("Shutting down. Goodbye!")
+                self.stop_screen_stream()
+                self.device_watcher.stop()
+                self.task_scheduler.shutdown()
+                llm_clients.close()
+                intent_index.save()
+                self.fleet.shutdown()
+                self.shell_pool.close_all()
                 return True
                 
         except Exception as e:
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Scriptable stand-in for the `adb` executable, for exercising and
+benchmarking the AndroidAIAgent device layer without a phone attached.
+
+It is driven by a JSON config file named in the FAKE_ADB_CONFIG environment
+variable (see DEFAULT_CONFIG for the keys). Shell commands are run by the
+host's /bin/sh with the device tools (input, am, pm, dumpsys, ...) replaced
+by stubs that answer from the config, so the persistent shell sessions and
+batch scripts behave as they would on a device. POSIX hosts only.
+
+Use write_launcher() to create an executable to pass as
+AndroidAIAgent(adb_path=...).
+"""
+import os
+import sys
+import json
+import time
+import random
+import struct
+import zlib
+import subprocess
+
+# Device tools that are replaced by stubs inside the fake shell
+DEVICE_COMMANDS = ['input', 'am', 'monkey', 'pm', 'cmd', 'dumpsys', 'settings', 'screencap', 'uiautomator']
+
+DEFAULT_UI_DUMP = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?><hierarchy rotation="0">
+<node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="com.example" clickable="false" enabled="true" bounds="[0,0][1080,2340]">
+<node index="0" text="Send money" resource-id="com.google.android.apps.nbu.paisa.user:id/send_money" class="android.widget.Button" clickable="true" enabled="true" bounds="[40,900][540,1000]" />
+<node index="1" text="" resource-id="com.google.android.apps.nbu.paisa.user:id/search" class="android.widget.EditText" clickable="true" enabled="true" bounds="[40,100][1040,200]" />
+<node index="2" text="Alice" resource-id="com.google.android.apps.nbu.paisa.user:id/contact_name" class="android.widget.TextView" clickable="true" enabled="true" bounds="[40,300][1040,400]" />
+<node index="3" text="Pay" resource-id="com.google.android.apps.nbu.paisa.user:id/pay" class="android.widget.Button" clickable="true" enabled="true" bounds="[40,1400][1040,1500]" />
+<node index="4" text="Confirm" resource-id="com.google.android.apps.nbu.paisa.user:id/confirm" class="android.widget.Button" clickable="true" enabled="true" bounds="[40,1100][1040,1200]" />
+<node index="5" text="" content-desc="Create new event" resource-id="com.google.android.calendar:id/floating_action_button" class="android.widget.ImageButton" clickable="true" enabled="true" bounds="[880,2000][1040,2160]" />
+<node index="6" text="Event" resource-id="" class="android.widget.TextView" clickable="true" enabled="true" bounds="[600,1800][1040,1880]" />
+<node index="7" text="Add title" resource-id="com.google.android.calendar:id/title" class="android.widget.EditText" clickable="true" enabled="true" bounds="[40,200][1040,300]" />
+<node index="8" text="Mon, 1 Jan" resource-id="com.google.android.calendar:id/start_date" class="android.widget.TextView" clickable="true" enabled="true" bounds="[40,500][540,580]" />
+<node index="9" text="Save" resource-id="com.google.android.calendar:id/save" class="android.widget.Button" clickable="true" enabled="true" bounds="[880,60][1040,140]" />
+</node>
+</hierarchy>"""
+
+DEFAULT_PACKAGES = [
+    'com.android.chrome', 'com.android.settings', 'com.android.vending',
+    'com.google.android.apps.messaging', 'com.google.android.dialer',
+    'com.google.android.contacts', 'com.google.android.calendar',
+    'com.google.android.apps.nbu.paisa.user', 'com.google.android.youtube',
+    'com.google.android.apps.maps', 'com.google.android.gm', 'com.whatsapp',
+]
+
+DEFAULT_CONFIG = {
+    # serial -> state, as reported by `adb devices` / `adb track-devices`
+    'devices': {'emulator-5554': 'device'},
+    # Seconds added to every adb invocation (process + transport setup)
+    'spawn_latency': 0.05,
+    # Seconds per device command, matched by longest prefix ("default" otherwise)
+    'latency': {'default': 0.01, 'screencap': 0.15, 'uiautomator': 0.3, 'pm list packages': 0.05},
+    # Failure probability per command prefix, e.g. {"monkey": 1.0}
+    'failures': {},
+    # Canned stdout per command prefix; overrides the built-in answers
+    'outputs': {},
+    'packages': DEFAULT_PACKAGES,
+    'ui_dump': DEFAULT_UI_DUMP,
+    'default_input_method': 'com.google.android.inputmethod.latin/com.android.inputmethod.latin.LatinIME',
+    'keyboard_shown': True,
+    'screen_size': [108, 234],
+    'seed': None,
+}
+
+
+def load_config():
+    config = dict(DEFAULT_CONFIG)
+    path = os.environ.get('FAKE_ADB_CONFIG')
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    return config
+
+
+def state_dir():
+    """Directory holding the fake device's mutable state (focused app, stubs)."""
+    path = os.environ.get('FAKE_ADB_STATE') or os.path.join(
+        os.path.dirname(os.path.abspath(os.environ.get('FAKE_ADB_CONFIG', __file__))), 'fake_adb_state'
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def match_prefix(table, command_line, default=None):
+    """Return the value of the longest key in `table` that prefixes the command."""
+    best = None
+    for key in table:
+        if key != 'default' and command_line.startswith(key) and (best is None or len(key) > len(best)):
+            best = key
+    if best is not None:
+        return table[best]
+    return table.get('default', default)
+
+
+def make_png(width, height):
+    """Build a solid-colour PNG in memory."""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    row = b'\x00' + b'\x20\x80\xc0' * width
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(row * height))
+        + chunk(b'IEND', b'')
+    )
+
+
+def focused_file():
+    return os.path.join(state_dir(), 'focused')
+
+
+def set_focus(component):
+    with open(focused_file(), 'w', encoding='utf-8') as f:
+        f.write(component)
+
+
+def get_focus():
+    try:
+        with open(focused_file(), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return 'com.google.android.apps.nexuslauncher/.NexusLauncherActivity'
+
+
+def device_command(args, config):
+    """
+    Answer one device tool invocation.
+
+    :return: (exit code, stdout bytes)
+    """
+    command_line = ' '.join(args)
+    time.sleep(match_prefix(config['latency'], command_line, 0.0))
+
+    if random.random() < match_prefix(config['failures'], command_line, 0.0):
+        return 1, b"Error: injected failure\n"
+
+    canned = match_prefix(config['outputs'], command_line)
+    if canned is not None:
+        return 0, canned.encode('utf-8')
+
+    name = args[0]
+    if name == 'pm' and args[1:3] == ['list', 'packages']:
+        packages = [pkg for pkg in config['packages'] if len(args) < 4 or args[3] in pkg]
+        return 0, ''.join(f"package:{pkg}\n" for pkg in packages).encode('utf-8')
+    if name == 'monkey':
+        package = args[args.index('-p') + 1]
+        if package not in config['packages']:
+            return 0, b"** No activities found to run, monkey aborted.\n"
+        set_focus(f"{package}/.MainActivity")
+        return 0, b"Events injected: 1\n"
+    if name == 'am' and len(args) > 1 and args[1] == 'start':
+        component = args[args.index('-n') + 1] if '-n' in args else ''
+        package = component.split('/')[0]
+        if package not in config['packages']:
+            return 1, f"Error: Activity class {component} does not exist.\n".encode('utf-8')
+        set_focus(component if not component.endswith('/') else f"{package}/.MainActivity")
+        return 0, f"Starting: Intent {{ cmp={component} }}\n".encode('utf-8')
+    if name == 'am' and len(args) > 1 and args[1] == 'broadcast':
+        return 0, b"Broadcasting: Intent { }\nBroadcast completed: result=0\n"
+    if name == 'cmd' and 'resolve-activity' in args:
+        package = args[-1]
+        return 0, f"priority=0 preferredOrder=0 match=0x108000 specificIndex=-1 isDefault=true\n{package}/.MainActivity\n".encode('utf-8')
+    if name == 'dumpsys' and len(args) > 1 and args[1] == 'window':
+        focus = get_focus()
+        return 0, f"  mCurrentFocus=Window{{1a2b3c u0 {focus}}}\n  mFocusedApp=ActivityRecord{{4d5e u0 {focus} t12}}\n".encode('utf-8')
+    if name == 'dumpsys' and len(args) > 1 and args[1] == 'input_method':
+        return 0, f"  mInputShown={'true' if config['keyboard_shown'] else 'false'}\n".encode('utf-8')
+    if name == 'dumpsys' and len(args) > 1 and args[1] == 'package':
+        return 0, f"Activity Resolver Table:\n  {args[2]}/.MainActivity filter\n".encode('utf-8')
+    if name == 'settings' and args[1:4] == ['get', 'secure', 'default_input_method']:
+        return 0, f"{config['default_input_method']}\n".encode('utf-8')
+    if name == 'screencap':
+        width, height = config['screen_size']
+        return 0, make_png(width, height)
+    if name == 'uiautomator':
+        return 0, (config['ui_dump'] + "\nUI hierchary dumped to: /dev/tty\n").encode('utf-8')
+    # input and anything else simply succeed
+    return 0, b""
+
+
+def stub_dir():
+    """Create the directory of device tool stubs that call back into this script."""
+    path = os.path.join(state_dir(), 'bin')
+    os.makedirs(path, exist_ok=True)
+    for name in DEVICE_COMMANDS:
+        stub = os.path.join(path, name)
+        if not os.path.exists(stub):
+            with open(stub, 'w', encoding='utf-8') as f:
+                f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" --device-command {name} "$@"\n')
+            os.chmod(stub, 0o755)
+    return path
+
+
+def device_shell(script=None):
+    """
+    Run a script (or an interactive session on our stdin) in a shell whose
+    device tools are the fake stubs.
+    """
+    env = dict(os.environ)
+    env['PATH'] = stub_dir() + os.pathsep + env.get('PATH', '')
+    cmd = ['/bin/sh'] if script is None else ['/bin/sh', '-c', script]
+    return subprocess.call(cmd, env=env)
+
+
+def main(argv):
+    config = load_config()
+    if config.get('seed') is not None:
+        random.seed(config['seed'])
+
+    if argv[:1] == ['--device-command']:
+        returncode, output = device_command(argv[1:], config)
+        sys.stdout.buffer.write(output)
+        sys.stdout.flush()
+        return returncode
+
+    time.sleep(config['spawn_latency'])
+
+    serial = None
+    while len(argv) >= 2 and argv[0] == '-s':
+        serial = argv[1]
+        argv = argv[2:]
+    if serial and config['devices'].get(serial) != 'device':
+        sys.stderr.write(f"adb: device '{serial}' not found\n")
+        return 1
+    if not argv:
+        sys.stderr.write("adb: no command\n")
+        return 1
+
+    command, args = argv[0], argv[1:]
+    if command == 'devices':
+        print("List of devices attached")
+        for device, state in config['devices'].items():
+            print(f"{device}\t{state}")
+        print()
+        return 0
+    if command == 'track-devices':
+        payload = ''.join(f"{device}\t{state}\n" for device, state in config['devices'].items())
+        sys.stdout.write(f"{len(payload):04x}{payload}")
+        sys.stdout.flush()
+        # adb keeps the connection open and pushes further changes
+        while True:
+            time.sleep(3600)
+    if command in ('shell', 'exec-out'):
+        if not args:
+            return device_shell()
+        # Like adb, join the arguments and let the device shell parse them
+        return device_shell(' '.join(args))
+    if command == 'version':
+        print("Android Debug Bridge version 1.0.41 (fake)")
+        return 0
+    sys.stderr.write(f"adb: unsupported command '{command}' in fake adb\n")
+    return 1
+
+
+def write_launcher(directory, config=None):
+    """
+    Write a config file and an executable `adb` launcher into a directory.
+
+    :param directory: Where to put the launcher, config and device state
+    :param config: Dict of overrides for DEFAULT_CONFIG
+    :return: Path to the launcher, suitable for AndroidAIAgent(adb_path=...)
+    """
+    os.makedirs(directory, exist_ok=True)
+    config_path = os.path.join(directory, 'fake_adb.json')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config or {}, f, indent=4)
+    launcher = os.path.join(directory, 'adb')
+    with open(launcher, 'w', encoding='utf-8') as f:
+        f.write(
+            "#!/bin/sh\n"
+            f'FAKE_ADB_CONFIG="{config_path}" FAKE_ADB_STATE="{os.path.join(directory, "state")}" '
+            f'exec "{sys.executable}" "{os.path.abspath(__file__)}" "$@"\n'
+        )
+    os.chmod(launcher, 0o755)
+    return launcher
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
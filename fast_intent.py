@@ -0,0 +1,182 @@
+import re
+import threading
+import logging
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+# Polite lead-ins stripped before pattern matching
+LEAD_IN_PATTERN = re.compile(
+    r"^(?:(?:hey|hi|ok|okay)\s+\w+\s*,?\s+)?(?:(?:please|kindly|can you|could you|would you|will you)\s+)+"
+)
+# Courtesy words at the end that never change what is asked, e.g. "open youtube please"
+TRAILING_COURTESY_PATTERN = re.compile(r"(?:\s+(?:please|now|right now|for me|thanks|thank you))+$")
+# A greeting on its own, e.g. "hey jarvis" before a comma
+GREETING_PATTERN = re.compile(r"^(?:hey|hi|hello|ok|okay)(?: \w+)?$")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s']")
+QUESTION_WORDS = {"what", "who", "why", "how", "when", "where", "which", "is", "are", "do", "does"}
+
+EXIT_PHRASES = {
+    "exit", "quit", "bye", "goodbye", "good bye", "bye bye", "bye jarvis", "goodbye jarvis",
+    "stop listening", "shut down", "shutdown", "see you later", "that's all",
+}
+
+# Utterance pattern -> system task, checked against the whole utterance
+SYSTEM_PATTERNS = [
+    (re.compile(r"^(?:turn |increase |raise )?(?:the )?volume up$|^(?:increase|raise|turn up) (?:the )?volume$|^louder$"), "system volume up"),
+    (re.compile(r"^(?:turn |decrease |lower )?(?:the )?volume down$|^(?:decrease|lower|reduce|turn down) (?:the )?volume$|^quieter$"), "system volume down"),
+    (re.compile(r"^(?:mute)(?: the)?(?: volume| phone| sound)?$"), "system mute"),
+    (re.compile(r"^(?:unmute)(?: the)?(?: volume| phone| sound)?$"), "system unmute"),
+    (re.compile(r"^(?:go )?(?:to )?(?:the )?home(?: screen)?$|^go home$"), "system go home"),
+    (re.compile(r"^go back$|^back$|^navigate back$"), "system go back"),
+    (re.compile(r"^(?:take|capture|grab) (?:a )?(?:screenshot|screen shot|screen capture)$|^screenshot$|^capture (?:the )?screen$"), "system take a screenshot"),
+]
+# "start", "launch", "kill" and "exit" are left to the model: "start over", "kill me"
+OPEN_PATTERN = re.compile(r"^open\s+(?:the\s+)?(.+?)(?:\s+app)?$")
+CLOSE_PATTERN = re.compile(r"^close\s+(?:the\s+)?(.+?)(?:\s+app)?$")
+# Only with an explicit song cue, so "play the game with me" goes to the model
+PLAY_PATTERN = re.compile(r"^play\s+(?:the\s+)?(?:song|track)\s+(.+)$")
+YOUTUBE_PATTERN = re.compile(r"^(?:search\s+(?:for\s+)?(.+?)\s+on\s+youtube|youtube\s+search\s+(?:for\s+)?(.+))$")
+GOOGLE_PATTERN = re.compile(r"^(?:search\s+(?:for\s+)?(.+?)\s+on\s+google|google\s+search\s+(?:for\s+)?(.+))$")
+# Splits compound commands like "open chrome and firefox"
+CONJUNCTION_PATTERN = re.compile(r"\s*(?:,|\band then\b|\bthen\b|\band\b)\s*")
+
+MAX_TARGET_WORDS = 4
+
+
+def normalize_utterance(text):
+    """
+    Normalize an utterance for matching: lowercase, punctuation removed,
+    polite lead-ins and trailing courtesy words stripped and whitespace
+    collapsed.
+
+    :param text: Raw utterance
+    :return: Normalized string
+    """
+    text = PUNCTUATION_PATTERN.sub(" ", text.lower())
+    text = " ".join(text.split())
+    text = LEAD_IN_PATTERN.sub("", text)
+    return TRAILING_COURTESY_PATTERN.sub("", text).strip()
+
+
+def _is_target(target):
+    """Check that an app/song name looks like a name, not a sentence or a question."""
+    words = target.split()
+    return 0 < len(words) <= MAX_TARGET_WORDS and words[0] not in QUESTION_WORDS
+
+
+def _classify_clause(clause, previous_verb=None, known_apps=frozenset()):
+    """
+    Classify one clause of an utterance.
+
+    :param previous_verb: Verb of the preceding clause, so "open chrome and
+                          firefox" can carry "open" over to "firefox"
+    :param known_apps: App names open/close may target
+    :return: (task, verb) or (None, None) if the clause is not recognised
+    """
+    if clause in EXIT_PHRASES:
+        return "exit", "exit"
+
+    for pattern, task in SYSTEM_PATTERNS:
+        if pattern.match(clause):
+            return task, "system"
+
+    match = YOUTUBE_PATTERN.match(clause)
+    if match:
+        return f"youtube search {next(group for group in match.groups() if group)}", "youtube search"
+    match = GOOGLE_PATTERN.match(clause)
+    if match:
+        return f"google search {next(group for group in match.groups() if group)}", "google search"
+
+    for pattern, verb in ((OPEN_PATTERN, "open"), (CLOSE_PATTERN, "close")):
+        match = pattern.match(clause)
+        if match and match.group(1) in known_apps:
+            return f"{verb} {match.group(1)}", verb
+    match = PLAY_PATTERN.match(clause)
+    if match and _is_target(match.group(1)):
+        return f"play {match.group(1)}", "play"
+
+    # A bare app name after a conjunction inherits the previous verb
+    if previous_verb in ("open", "close") and clause in known_apps:
+        return f"{previous_verb} {clause}", previous_verb
+
+    return None, None
+
+
+class FastIntentClassifier:
+    """
+    Rule-based classifier for common, unambiguous commands.
+
+    It returns the same task strings as FirstLayerDMM ("open chrome",
+    "system volume up", "exit", ...) when every clause of the utterance
+    matches a rule, and None otherwise so the caller can fall back to the
+    remote model. Open and close only match apps it has been told about,
+    so "open tom and jerry" is never guessed at. Hit and miss counts are
+    kept for reporting.
+    """
+
+    def __init__(self, known_apps=None):
+        """
+        :param known_apps: App names open/close may target
+        """
+        self.known_apps = frozenset()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if known_apps:
+            self.set_known_apps(known_apps)
+
+    def set_known_apps(self, known_apps):
+        """
+        :param known_apps: App names open/close may target, e.g. the keys of
+                           the agent's app -> package table
+        """
+        self.known_apps = frozenset(normalize_utterance(name) for name in known_apps)
+
+    def classify(self, utterance):
+        """
+        Classify an utterance locally.
+
+        :param utterance: Raw user utterance
+        :return: List of task strings, or None if not confident
+        """
+        tasks = []
+        verb = None
+        # Split before normalizing, which would drop the commas
+        for clause in CONJUNCTION_PATTERN.split(utterance.lower()):
+            clause = normalize_utterance(clause)
+            if not clause or (not tasks and GREETING_PATTERN.match(clause)):
+                continue
+            task, verb = _classify_clause(clause, verb, self.known_apps)
+            if task is None:
+                tasks = []
+                break
+            tasks.append(task)
+
+        with self.lock:
+            if tasks:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if tasks:
+            logger.info(f"Fast-path classified '{utterance}' as {tasks}")
+            return tasks
+        return None
+
+    def stats(self):
+        """
+        :return: Dict with hits, misses, total and hit_rate
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'total': total,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,281 @@
+import os
+import re
+import json
+import math
+import threading
+import logging
+
+import numpy as np
+
+from dmm_cache import cache_key
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+
+def tokenize(utterance):
+    """
+    Turn an utterance into TF-IDF features: the words of its cache key plus
+    adjacent word pairs, so word order still counts for something.
+    """
+    words = TOKEN_PATTERN.findall(cache_key(utterance))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class IntentIndex:
+    """
+    Nearest-neighbour classifier over past utterances and the tasks
+    FirstLayerDMM labelled them with.
+
+    Utterances are embedded as L2-normalised TF-IDF rows, or as spaCy
+    vectors when the loaded pipeline ships real word vectors, and stacked
+    into one NumPy matrix. A lookup is a single matrix product against
+    every stored row, so a batch of queries costs one BLAS call. Only
+    matches at or above the confidence threshold are returned; anything
+    else falls through to the remote model.
+    """
+
+    def __init__(self, path=None, threshold=0.85, max_entries=5000, nlp=None, save_every=20):
+        """
+        :param path: JSON file the labelled utterances are persisted to, or None
+        :param threshold: Minimum cosine similarity for an answer
+        :param max_entries: Oldest utterances are dropped beyond this many
+        :param nlp: Optional spaCy pipeline; used only if it has word vectors
+        :param save_every: Write the file after this many new utterances
+        """
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self.nlp = None
+        self.utterances = []
+        self.labels = []
+        self.rows = {}  # utterance key -> row
+        self.vocabulary = {}
+        self.document_frequency = []
+        self.matrix = None
+        self.appended = 0
+        self.unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        if path:
+            self.load()
+        self.set_nlp(nlp)
+
+    @property
+    def mode(self):
+        return 'spacy' if self.nlp is not None else 'tfidf'
+
+    def set_nlp(self, nlp):
+        """
+        Use a spaCy pipeline's word vectors instead of TF-IDF. Small
+        pipelines like en_core_web_sm have no static vectors, in which case
+        TF-IDF stays in use.
+        """
+        if nlp is not None and not nlp.vocab.vectors_length:
+            logger.info("spaCy pipeline has no word vectors; intent index keeps using TF-IDF")
+            nlp = None
+        with self.lock:
+            if nlp is not self.nlp:
+                self.nlp = nlp
+                self.matrix = None
+
+    def __len__(self):
+        return len(self.utterances)
+
+    def _count_features(self, utterance):
+        counts = {}
+        for feature in tokenize(utterance):
+            counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    def _tfidf_rows(self, utterances, grow=False):
+        """
+        Build normalised TF-IDF rows.
+
+        :param grow: Add unseen features to the vocabulary (for stored
+                     utterances). Queries have no column for features never
+                     seen before, but those still count toward the row norm
+                     at the highest IDF, so a query full of new words cannot
+                     match a short stored utterance at full confidence.
+        """
+        rows = []
+        for utterance in utterances:
+            counts = self._count_features(utterance)
+            if grow:
+                for feature in counts:
+                    if feature not in self.vocabulary:
+                        self.vocabulary[feature] = len(self.vocabulary)
+                        self.document_frequency.append(0)
+                    self.document_frequency[self.vocabulary[feature]] += 1
+            rows.append(counts)
+
+        total = max(len(self.utterances), 1)
+        unseen_idf = math.log(1 + total) + 1
+        matrix = np.zeros((len(rows), len(self.vocabulary)), dtype=np.float32)
+        unseen = np.zeros((len(rows), 1), dtype=np.float32)
+        for i, counts in enumerate(rows):
+            for feature, count in counts.items():
+                column = self.vocabulary.get(feature)
+                if column is not None:
+                    idf = math.log((1 + total) / (1 + self.document_frequency[column])) + 1
+                    matrix[i, column] = (1 + math.log(count)) * idf
+                else:
+                    unseen[i, 0] += ((1 + math.log(count)) * unseen_idf) ** 2
+        norms = np.sqrt(np.sum(matrix ** 2, axis=1, keepdims=True) + unseen)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _vector_rows(self, utterances):
+        matrix = np.array([self.nlp(cache_key(u)).vector for u in utterances], dtype=np.float32)
+        return self._normalize(matrix.reshape(len(utterances), -1))
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _rebuild(self):
+        """Recompute every stored row, e.g. after IDF weights have drifted."""
+        self.appended = 0
+        self.vocabulary = {}
+        self.document_frequency = []
+        if self.mode == 'spacy':
+            self.matrix = self._vector_rows(self.utterances) if self.utterances else None
+        else:
+            self.matrix = self._tfidf_rows(self.utterances, grow=True) if self.utterances else None
+
+    def add(self, utterance, tasks):
+        """
+        Learn, or relearn, the tasks for an utterance.
+
+        The new row is appended to the matrix without touching the others.
+        Their IDF weights are refreshed by a full rebuild once a quarter of
+        the rows have been appended this way.
+        """
+        key = cache_key(utterance)
+        if not key or not tasks:
+            return
+        with self.lock:
+            row = self.rows.get(key)
+            if row is not None:
+                self.labels[row] = list(tasks)
+            else:
+                self.rows[key] = len(self.utterances)
+                self.utterances.append(key)
+                self.labels.append(list(tasks))
+                if len(self.utterances) > self.max_entries:
+                    # Drop the oldest tenth at once, so rows are renumbered rarely
+                    self._drop_oldest(max(1, self.max_entries // 10))
+                elif self.matrix is not None:
+                    if self.mode == 'spacy':
+                        row = self._vector_rows([key])
+                    else:
+                        row = self._tfidf_rows([key], grow=True)
+                        # New features widen the matrix
+                        if row.shape[1] > self.matrix.shape[1]:
+                            self.matrix = np.pad(self.matrix, ((0, 0), (0, row.shape[1] - self.matrix.shape[1])))
+                    self.matrix = np.vstack([self.matrix, row])
+                    self.appended += 1
+                    if self.appended * 4 > len(self.utterances):
+                        self.matrix = None
+            self.unsaved += 1
+            if self.path and self.unsaved >= self.save_every:
+                self.save()
+
+    def _drop_oldest(self, count):
+        del self.utterances[:count], self.labels[:count]
+        self.rows = {key: row for row, key in enumerate(self.utterances)}
+        self.matrix = None
+
+    def classify_batch(self, utterances):
+        """
+        Classify several utterances with one matrix product.
+
+        :return: List with, per utterance, (tasks, score) for a confident
+                 match or (None, score) otherwise
+        """
+        with self.lock:
+            if not self.utterances:
+                self.misses += len(utterances)
+                return [(None, 0.0)] * len(utterances)
+            if self.matrix is None:
+                self._rebuild()
+            keys = [cache_key(u) for u in utterances]
+            queries = self._vector_rows(keys) if self.mode == 'spacy' else self._tfidf_rows(keys)
+            columns = min(queries.shape[1], self.matrix.shape[1])
+            scores = queries[:, :columns] @ self.matrix[:, :columns].T
+            best = scores.argmax(axis=1)
+
+            results = []
+            for i, row in enumerate(best):
+                score = float(scores[i, row])
+                if score >= self.threshold:
+                    self.hits += 1
+                    results.append((list(self.labels[row]), score))
+                else:
+                    self.misses += 1
+                    results.append((None, score))
+            return results
+
+    def classify(self, utterance):
+        """
+        :return: List of tasks for a confident match, otherwise None
+        """
+        tasks, score = self.classify_batch([utterance])[0]
+        if tasks:
+            logger.info(f"Intent index matched '{utterance}' as {tasks} (similarity {score:.2f})")
+        return tasks
+
+    def save(self):
+        """Write the labelled utterances to disk atomically."""
+        if not self.path:
+            return
+        with self.lock:
+            data = {'utterances': self.utterances, 'labels': self.labels}
+            self.unsaved = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not save intent index to {self.path}: {e}")
+
+    def load(self):
+        """Load labelled utterances from disk; the matrix is rebuilt on first use."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load intent index from {self.path}: {e}")
+            return
+        with self.lock:
+            self.utterances = list(data.get('utterances', []))[-self.max_entries:]
+            self.labels = list(data.get('labels', []))[-self.max_entries:]
+            self.rows = {key: row for row, key in enumerate(self.utterances)}
+            self.matrix = None
+        logger.info(f"Loaded {len(self.utterances)} labelled utterances into the intent index")
+
+    def stats(self):
+        """
+        :return: Dict with hits, misses, hit_rate, size and mode
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self.utterances),
+                'mode': self.mode,
+            }
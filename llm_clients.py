@@ -0,0 +1,235 @@
+import asyncio
+import threading
+import logging
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+import cohere
+from groq import AsyncGroq
+from dotenv import dotenv_values
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+env_vars = dotenv_values(".env")
+
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when a provider call, or the wait for a free slot, runs out of time."""
+
+
+class _LoopState:
+    """Clients and semaphores bound to one event loop."""
+
+    def __init__(self):
+        self.clients = {}
+        self.http_clients = {}
+        self.semaphores = {}
+
+
+class AsyncLLMClients:
+    """
+    Shared asyncio clients for Cohere and Groq.
+
+    Each provider gets one pooled HTTP client, a concurrency limit and a
+    timeout. Clients and semaphores are created lazily for every event loop
+    that uses them, because neither can be shared between loops. Code that
+    isn't async can run coroutines on a shared background loop with run()
+    or submit(), so many requests stay in flight without a thread each.
+    """
+
+    def __init__(self, cohere_api_key=None, groq_api_key=None, max_concurrency=8,
+                 timeout=30.0, queue_timeout=10.0, max_connections=20):
+        """
+        :param max_concurrency: Requests in flight per provider
+        :param timeout: Seconds a single provider request may take
+        :param queue_timeout: Seconds to wait for a free slot before giving up
+        :param max_connections: Pooled HTTP connections per provider
+        """
+        self.api_keys = {'cohere': cohere_api_key, 'groq': groq_api_key}
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_connections = max_connections
+        self.states = weakref.WeakKeyDictionary()
+        self.loop = None
+        self.loop_thread = None
+        self.lock = threading.Lock()
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self.states.get(loop)
+        if state is None:
+            state = self.states[loop] = _LoopState()
+        return state
+
+    def _http_client(self, provider):
+        state = self._state()
+        state.http_clients[provider] = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0)),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+        return state.http_clients[provider]
+
+    def client(self, provider):
+        """
+        :param provider: 'cohere' or 'groq'
+        :return: The async client for the provider on the running loop
+        """
+        state = self._state()
+        client = state.clients.get(provider)
+        if client is None:
+            if provider == 'cohere':
+                client = cohere.AsyncClient(
+                    api_key=self.api_keys['cohere'], timeout=self.timeout, httpx_client=self._http_client(provider)
+                )
+            elif provider == 'groq':
+                client = AsyncGroq(
+                    api_key=self.api_keys['groq'], timeout=self.timeout, http_client=self._http_client(provider)
+                )
+            else:
+                raise ValueError(f"Unknown LLM provider: {provider}")
+            state.clients[provider] = client
+        return client
+
+    @asynccontextmanager
+    async def slot(self, provider):
+        """Hold one of the provider's concurrency slots."""
+        state = self._state()
+        semaphore = state.semaphores.get(provider)
+        if semaphore is None:
+            semaphore = state.semaphores[provider] = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"No free {provider} slot after {self.queue_timeout}s")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    async def _within_deadline(self, provider, stream):
+        """
+        Yield from an async stream, failing once the whole stream exceeds the
+        timeout. The stream is closed however this ends (finished, timed out,
+        or abandoned by the caller), so its HTTP response is released.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        iterator = stream.__aiter__()
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise LLMTimeoutError(f"{provider} stream exceeded {self.timeout}s")
+                try:
+                    item = await asyncio.wait_for(iterator.__anext__(), remaining)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError(f"{provider} stream exceeded {self.timeout}s")
+                yield item
+        finally:
+            # Async generators have aclose(); the SDKs' stream objects have an async close()
+            close = getattr(stream, 'aclose', None) or getattr(stream, 'close', None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception as e:
+                    logger.debug(f"Closing {provider} stream failed: {e}")
+
+    async def cohere_chat_stream(self, **kwargs):
+        """
+        Stream a Cohere chat, yielding the generated text pieces.
+
+        :param kwargs: Arguments for Cohere's chat_stream
+        """
+        async with self.slot('cohere'):
+            stream = self.client('cohere').chat_stream(**kwargs)
+            async for event in self._within_deadline('cohere', stream):
+                if event.event_type == "text-generation":
+                    yield event.text
+
+    async def groq_chat_stream(self, **kwargs):
+        """
+        Stream a Groq chat completion, yielding the generated text pieces.
+
+        :param kwargs: Arguments for chat.completions.create (stream is forced on)
+        """
+        async with self.slot('groq'):
+            try:
+                stream = await asyncio.wait_for(
+                    self.client('groq').chat.completions.create(stream=True, **kwargs), self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError(f"groq request exceeded {self.timeout}s")
+            async for chunk in self._within_deadline('groq', stream):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def _background_loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="llm-loop")
+                self.loop_thread.start()
+            return self.loop
+
+    def submit(self, coro):
+        """
+        Run a coroutine on the shared background loop.
+
+        :return: concurrent.futures.Future with the result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._background_loop())
+
+    def iterate(self, agen):
+        """
+        Iterate an async generator from synchronous code; the generator runs
+        on the shared background loop and items are handed over as they come.
+        """
+        async def next_item():
+            return await agen.__anext__()
+
+        loop = self._background_loop()
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(next_item(), loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the shared background loop and wait for its result."""
+        return self.submit(coro).result(timeout)
+
+    async def aclose(self):
+        """Close the HTTP clients of the running loop."""
+        state = self.states.pop(asyncio.get_running_loop(), None)
+        if state is None:
+            return
+        for provider, http_client in state.http_clients.items():
+            try:
+                await http_client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing {provider} client: {e}")
+
+    def close(self):
+        """Close the background loop and its clients."""
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(5)
+            loop.call_soon_threadsafe(loop.stop)
+
+
+# Shared clients used by model.py and RealTime.py
+llm_clients = AsyncLLMClients(
+    cohere_api_key=env_vars.get("CohereAPIKey"),
+    groq_api_key=env_vars.get("GroqAPIKey"),
+    max_concurrency=int(env_vars.get("LLMConcurrency") or 8),
+    timeout=float(env_vars.get("LLMTimeout") or 30.0),
+)
@@ -1,14 +1,30 @@
-import cohere # Import the Cohere Library for AI services.
 from rich import print #Import the Rich library to enhance terminal outputs,
+from collections import namedtuple, Counter # Import namedtuple for the command type and Counter for hedging stats.
+import asyncio # Import asyncio to race the classification backends.
+import logging # Import logging to report slow or failed backends.
 from dotenv import dotenv_values # Import dateny to load environment variables from a .env file.
+from fast_intent import FastIntentClassifier # Import the local rule-based classifier for common commands.
+from dmm_cache import ClassificationCache # Import the cache of previous classification results.
+from llm_clients import llm_clients # Import the shared async clients with pooled connections.
+from intent_index import IntentIndex # Import the nearest-neighbour classifier learned from past answers.
+from prompt_budget import PromptBudget, Section, prompt_metrics # Import the token budgeting for prompts.
 # Load environment variables from the .env file.
 env_vars=dotenv_values(".env")
 
-#Retrieve API key.
-CohereAPIKey = env_vars.get("CohereAPIKey")
+# Retrieve the classification cache file (set it to an empty value to keep the cache in memory only).
+ClassifierCachePath = env_vars.get("ClassifierCachePath", "ClassifierCache.db")
+# Retrieve the intent index file and the similarity needed to trust it.
+IntentIndexPath = env_vars.get("IntentIndexPath", "IntentIndex.json")
+IntentIndexThreshold = float(env_vars.get("IntentIndexThreshold") or 0.85)
+# Retrieve the seconds to wait for Cohere before also asking Groq, and the end-to-end classification budget.
+ClassificationHedgeDelay = float(env_vars.get("ClassificationHedgeDelay") or 1.5)
+ClassificationBudget = float(env_vars.get("ClassificationBudget") or 6.0)
+# Retrieve the token budgets for the whole classification prompt and for its few-shot examples.
+ClassifierPromptBudget = int(env_vars.get("ClassifierPromptBudget") or 2000)
+ClassifierExamplesBudget = int(env_vars.get("ClassifierExamplesBudget") or 400)
 
-# Create a Cohere client using the provided API key.
-co= cohere.Client(api_key=CohereAPIKey)
+# Create a logger for this module.
+logger = logging.getLogger(__name__)
 
 # Define a list of recognized function keywords for task categorization.
 funcs= [
@@ -16,8 +32,12 @@ funcs= [
 "system", "content", "google search",
 "youtube search", "reminder"
 ]
-# Initialize an empty list to store user messages.
-messages = []
+# Define the typed result of classifying one task, carried unchanged through the command queue.
+ClassifiedCommand = namedtuple(
+    'ClassifiedCommand',
+    ['raw_command', 'category_type', 'query', 'serial', 'tag', 'context'],
+    defaults=[None, None, None]  # Serial and tag are optional device routing hints; context is prefetched search results.
+)
 
 # Define the preamble that guides the AI model on how to categorize queries.
 preamble = """
@@ -67,52 +87,262 @@ ChatHistory = [
     {"role": "User", "message": "chat with me."},
     {"role": "Chatbot", "message": "general chat with me."}
 ]
-# Define the main function for decision-making on queries.
-def FirstLayerDMM(prompt: str = "test"):
-    # Add the user's query to the messages list.
-    messages.append({"role": "user", "content": f"{prompt}"})
-    # Create a streaming chat session with the Cohere model.
-    stream = co.chat_stream(
+# Create the local classifier that answers high-confidence commands without a remote call.
+fast_classifier = FastIntentClassifier()
+
+# Create the cache of remote classifications, shared by every caller of FirstLayerDMM.
+classification_cache = ClassificationCache(path=ClassifierCachePath or None)
+
+# Create the nearest-neighbour index that learns from every answer the remote model gives.
+intent_index = IntentIndex(path=IntentIndexPath or None, threshold=IntentIndexThreshold)
+
+# Categories whose query is the utterance itself, so a similar utterance's category carries over.
+VERBATIM_CATEGORIES = {"general", "realtime"}
+
+# Define a function that checks whether a learned answer can be reused for similar utterances.
+def IsReusableTask(tasks: list):
+    # Only single tasks whose query is the utterance itself; tasks without a query (e.g. "exit") always go to the model.
+    if len(tasks) != 1:
+        return False
+    category, query = SplitTask(tasks[0])
+    return category in VERBATIM_CATEGORIES and bool(query)
+
+# Define a function that classifies a query by the nearest previously seen query.
+def IndexDMM(prompt: str):
+    tasks = intent_index.classify(prompt)
+    if not tasks or not IsReusableTask(tasks):
+        return None
+    # Take only the category from the neighbour; the query comes from this utterance, never the neighbour's.
+    category, query = SplitTask(tasks[0])
+    return [f"{category} {prompt.strip()}"]
+
+# Define a function that answers a query without the remote model when it safely can.
+def LocalDMM(prompt: str):
+    # Try the rule-based fast path, then the exact cache, then the nearest previously seen query.
+    return fast_classifier.classify(prompt) or classification_cache.get(prompt) or IndexDMM(prompt)
+
+# Define a function that remembers an answer from the remote model for future queries.
+def LearnDMM(prompt: str, tasks: list):
+    # Don't learn the fallback used when the model gave no valid task.
+    if tasks and tasks != ["general (query)"]:
+        classification_cache.put(prompt, tasks)
+        # The index only learns answers it can safely reuse for a different utterance.
+        if IsReusableTask(tasks):
+            intent_index.add(prompt, tasks)
+
+# Define a function that checks whether a task starts with a recognized function keyword.
+def IsValidTask(task: str):
+    return any(task.startswith(func) for func in funcs)
+
+# Define a function that splits a task into its function keyword and the rest of the query.
+def SplitTask(task: str):
+    # Try the longest keywords first so "google search x" is not read as "google".
+    for func in sorted(funcs, key=len, reverse=True):
+        if task == func or task.startswith(func + " "):
+            return func, task[len(func):].strip()
+    # Fall back to the first word for tasks outside the known keywords.
+    parts = task.split(None, 1)
+    return (parts[0], parts[1] if len(parts) > 1 else "") if parts else ("general", "")
+
+# Create the token budget for classification prompts; the few-shot examples are trimmed first.
+classifier_budget = PromptBudget(
+    "classifier", ClassifierPromptBudget, {"examples": ClassifierExamplesBudget}, metrics=prompt_metrics
+)
+
+# Define a function that assembles a classification prompt within its token budget.
+def ClassifierPrompt(prompt: str = "test"):
+    return classifier_budget.assemble([
+        Section("preamble", preamble, priority=2),  # The instructions are never trimmed.
+        Section("examples", ChatHistory, priority=0, trim="oldest"),  # Drop the oldest examples first.
+        Section("query", prompt, priority=1, trim="tail"),  # Cut an overly long query from the end.
+    ])
+
+# Define a function that builds the arguments of a classification request to the Cohere model.
+def CohereChatArgs(assembled):
+    return dict(
         model='command-r-plus',  # Specify the Cohere model to use.
-        message=prompt,  # Pass the user's query.
+        message=assembled["query"],  # Pass the user's query.
         temperature=0.7,  # Set the creativity level of the model.
-        chat_history=ChatHistory,  # Provide the predefined chat history for context.
+        chat_history=assembled["examples"],  # Provide the predefined chat history for context.
         prompt_truncation='OFF',  # Ensure the prompt is not truncated.
         connectors=[],  # No additional connectors are used.
-        preamble=preamble  # Pass the detailed instruction preamble.
+        preamble=assembled["preamble"]  # Pass the detailed instruction preamble.
+    )
+
+# Define a function that splits streamed text into the tasks it completes and the segment still being written.
+def CompletedTasks(pending: str, text: str):
+    pending += text.replace("\n", "")
+    # Every comma closes a segment; the text after the last one is still being written.
+    *segments, pending = pending.split(",")
+    # Keep only the completed segments that are valid tasks.
+    tasks = [segment.strip() for segment in segments if IsValidTask(segment.strip())]
+    return tasks, pending
+
+# Define a function that builds the Groq version of the classification request from the same preamble and examples.
+def GroqChatArgs(assembled):
+    history = [{"role": "user" if turn["role"] == "User" else "assistant", "content": turn["message"]} for turn in assembled["examples"]]
+    return dict(
+        model="llama3-70b-8192",  # Use the same Groq model as RealTime.py.
+        messages=[{"role": "system", "content": assembled["preamble"]}] + history + [{"role": "user", "content": assembled["query"]}],
+        temperature=0.7,  # Match the creativity level of the Cohere request.
+        max_tokens=256,  # A list of tasks is short.
     )
 
-    # Initialize an empty string to store the generated response.
-    response = ""
-    # Iterate over events in the stream and capture text generation events.
-    for event in stream:
-        if event.event_type == "text-generation":
-            response += event.text  # Append generated text to the response.
-    # Remove newline Characters T and split responses into individual tasks.
-    response = response.replace("\n", "")
-    response = response.split(",")
-    # Strip leading and trailing whitespaces from each task.
-    response = [i.strip() for i in response]
-    # Initialize an empty list to filter valid tasks.
-    temp = []
-    # Filter the tasks based on recognized function keywords.
-    for task in response:
-        for func in funcs:
-            if task.startswith(func):
-                temp.append(task)  # Add valid tasks to the filtered list.
-    # Update the response with the filtered list of tasks.
-    response = temp
-    # If '(query)' is in the response, recursively call the function for further clarification.
-    if "(query)" in response:
-        newresponse = FirstLayerDMM(prompt=prompt)
-        return newresponse  # Return the clarified response.
-    
-    # Fallback if no valid tasks are found
-    if not response:
-        response = ["general (query)"]
-    
-    # Return the final response
-    return response
+# Define an async generator that yields the valid tasks one backend writes, as it writes them.
+async def RemoteTasksAsync(texts, assembled=None):
+    # Hold the text of the segment the model is still writing, and the whole completion for the metrics.
+    pending = ""
+    completion = ""
+    try:
+        async for text in texts:
+            completion += text
+            completed, pending = CompletedTasks(pending, text)
+            for task in completed:
+                yield task
+        # The last segment is complete once the stream ends.
+        if IsValidTask(pending.strip()):
+            yield pending.strip()
+    finally:
+        await texts.aclose()  # Release the backend's connection slot even when the race is lost.
+        if assembled is not None:
+            assembled.finish(completion)  # Record the prompt and completion sizes.
+
+# Define a coroutine that feeds one backend's tasks into a shared queue, ending with a None marker.
+async def FeedTasksAsync(name: str, tasks, queue: asyncio.Queue):
+    try:
+        async for task in tasks:
+            await queue.put((name, task))
+    except asyncio.CancelledError:
+        raise  # The other backend won; stop quietly.
+    except Exception as e:
+        logger.error(f"{name} classification failed: {e}")
+    finally:
+        await tasks.aclose()
+    await queue.put((name, None))
+
+# Count how often the hedge was needed, who won, and how often the budget ran out.
+hedge_stats = Counter()
+
+# Define an async generator that races Cohere against a delayed Groq hedge within a time budget.
+async def HedgedDMMStreamAsync(prompt: str = "test", hedge_delay: float = None, budget: float = None):
+    hedge_delay = ClassificationHedgeDelay if hedge_delay is None else hedge_delay
+    budget = ClassificationBudget if budget is None else budget
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + budget  # Nothing is waited for past this point.
+    queue = asyncio.Queue()
+    # Start the primary backend straight away.
+    assembled = ClassifierPrompt(prompt)
+    runners = {"cohere": asyncio.create_task(FeedTasksAsync("cohere", RemoteTasksAsync(
+        llm_clients.cohere_chat_stream(**CohereChatArgs(assembled)), assembled), queue))}
+
+    # Define a helper that starts the Groq hedge once.
+    def StartHedge():
+        if "groq" not in runners:
+            hedge_stats["hedges"] += 1
+            logger.info(f"Cohere slow after {loop.time() - started:.2f}s; hedging classification with Groq")
+            hedge_prompt = ClassifierPrompt(prompt)
+            runners["groq"] = asyncio.create_task(FeedTasksAsync("groq", RemoteTasksAsync(
+                llm_clients.groq_chat_stream(**GroqChatArgs(hedge_prompt)), hedge_prompt), queue))
+
+    winner = None  # The first backend to produce a valid task.
+    finished = set()  # Backends whose stream has ended.
+    tasks = []
+    unclear = False  # Whether the winner wrote the '(query)' placeholder instead of the query.
+    try:
+        while loop.time() < deadline:
+            # Before anyone has answered, wake up in time to launch the hedge.
+            wake_at = deadline if winner or "groq" in runners else min(deadline, started + hedge_delay)
+            try:
+                name, task = await asyncio.wait_for(queue.get(), max(wake_at - loop.time(), 0))
+            except asyncio.TimeoutError:
+                if winner is None:
+                    StartHedge()
+                continue
+            if task is None:
+                finished.add(name)
+                if name == winner or (winner is None and finished == set(runners) and "groq" in runners):
+                    break  # The winner is done, or every backend failed.
+                if winner is None:
+                    StartHedge()  # The primary gave nothing usable; don't wait out the delay.
+                continue
+            if winner is None:
+                winner = name
+                hedge_stats[f"{name}_wins"] += 1
+                # Stop the losing backend so it doesn't hold a connection slot.
+                for other, runner in runners.items():
+                    if other != name:
+                        runner.cancel()
+            if name == winner:
+                # Fill in a '(query)' placeholder with the user's words rather than asking the model again.
+                if "(query)" in task:
+                    unclear = True
+                    task = task.replace("(query)", prompt)
+                tasks.append(task)
+                yield task  # Hand the task over while the winner keeps generating.
+        else:
+            hedge_stats["budget_exceeded"] += 1
+            logger.warning(f"Classification of '{prompt}' ran out of its {budget}s budget")
+    finally:
+        for runner in runners.values():
+            runner.cancel()
+
+    # Only learn answers that arrived in full and that needed no placeholder filled in.
+    if tasks and winner in finished and not unclear:
+        LearnDMM(prompt, tasks)
+    elif not tasks:
+        # Treat an unclassified query as a general one so it still gets answered.
+        yield f"general {prompt}"
+
+# Define the coroutine version of FirstLayerDMMStream, so many classifications can be in flight without a thread each.
+async def FirstLayerDMMStreamAsync(prompt: str = "test"):
+    # Local and cached answers are complete already, so yield them straight away.
+    tasks = LocalDMM(prompt)
+    if tasks:
+        for task in tasks:
+            yield task
+        return
+    # Otherwise race the remote backends within the classification budget.
+    async for task in HedgedDMMStreamAsync(prompt):
+        yield task
+
+# Define the coroutine version of FirstLayerDMM.
+async def FirstLayerDMMAsync(prompt: str = "test"):
+    return [task async for task in FirstLayerDMMStreamAsync(prompt)]
+
+# Define a generator that yields each task as soon as a model has finished writing it.
+def FirstLayerDMMStream(prompt: str = "test"):
+    # Local and cached answers are complete already, so yield them without touching the event loop.
+    tasks = LocalDMM(prompt)
+    if tasks:
+        yield from tasks
+        return
+    # Run the hedged remote classification on the shared event loop and pass its tasks on.
+    yield from llm_clients.iterate(HedgedDMMStreamAsync(prompt))
+
+# Define a function that turns one classified task into a command object.
+def ToCommand(raw_command: str, task: str, serial=None, tag=None):
+    category_type, query = SplitTask(task)  # Separate the function keyword from its query.
+    return ClassifiedCommand(raw_command, category_type, query, serial, tag)
+
+# Define a generator that classifies an utterance once and yields a command per task as it is written.
+def ClassifyStream(prompt: str, serial=None, tag=None):
+    for task in FirstLayerDMMStream(prompt):
+        yield ToCommand(prompt, task, serial, tag)
+
+# Define the main function for decision-making on queries.
+def FirstLayerDMM(prompt: str = "test"):
+    # Local answers first, then the hedged remote backends, all within the classification budget.
+    return list(FirstLayerDMMStream(prompt))
+
+# Define a function that reports how many queries were answered locally or from the cache.
+def ClassifierStats():
+    stats = fast_classifier.stats()
+    stats["cache"] = classification_cache.stats()
+    stats["intent_index"] = intent_index.stats()
+    stats["remote_calls"] = stats["intent_index"]["misses"]  # Every query none of the local classifiers answered costs one remote call.
+    stats["hedging"] = dict(hedge_stats)  # How often Groq was asked too, who won, and how often the budget ran out.
+    return stats
 
 # Entry point for the script.
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import threading
+import time
+import logging
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+
+def parse_package_list(output):
+    """
+    Parse `pm list packages` output into a set of package names.
+
+    :param output: Raw command output ("package:com.example" per line)
+    :return: Set of package names
+    """
+    packages = set()
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("package:"):
+            packages.add(line[len("package:"):].strip())
+    return packages
+
+
+class PackageIndex:
+    """
+    Per-device cache of installed packages.
+
+    The full list is loaded once and reloaded after `ttl` seconds. Between
+    reloads, a lookup miss triggers a targeted `pm list packages <name>`
+    check so fresh installs are picked up incrementally, and callers can
+    drop a package with `forget` when a launch shows it was uninstalled.
+    """
+
+    def __init__(self, run_shell, ttl=300.0):
+        """
+        :param run_shell: Callable (command, serial) -> command output
+        :param ttl: Seconds before the full package list is reloaded
+        """
+        self.run_shell = run_shell
+        self.ttl = ttl
+        self.packages = {}   # serial -> set of package names
+        self.loaded_at = {}  # serial -> monotonic load time
+        self.lock = threading.Lock()
+
+    def _is_stale(self, serial):
+        loaded_at = self.loaded_at.get(serial)
+        return loaded_at is None or time.monotonic() - loaded_at > self.ttl
+
+    def refresh(self, serial=None):
+        """Reload the full package list for a device."""
+        output = self.run_shell("pm list packages", serial)
+        packages = parse_package_list(output)
+        with self.lock:
+            self.packages[serial] = packages
+            self.loaded_at[serial] = time.monotonic()
+        logger.info(f"Loaded {len(packages)} packages for device {serial or 'default'}")
+        return packages
+
+    def get_packages(self, serial=None):
+        """
+        Return the cached package set, reloading it if it has expired.
+        """
+        with self.lock:
+            stale = self._is_stale(serial)
+            packages = self.packages.get(serial)
+        if stale or packages is None:
+            packages = self.refresh(serial)
+        return packages
+
+    def resolve(self, app_package, serial=None):
+        """
+        Find the installed package matching `app_package`.
+
+        :param app_package: Exact or partial package name
+        :param serial: Device serial
+        :return: Installed package name, or None if not installed
+        """
+        packages = self.get_packages(serial)
+        if app_package in packages:
+            return app_package
+
+        matching_packages = sorted(pkg for pkg in packages if app_package in pkg)
+        if matching_packages:
+            logger.info(f"Found similar package: {matching_packages[0]}")
+            return matching_packages[0]
+
+        # Not in the cached list; check the device directly in case it was
+        # installed since the last reload.
+        output = self.run_shell(f"pm list packages {app_package}", serial)
+        new_packages = parse_package_list(output)
+        if not new_packages:
+            return None
+        with self.lock:
+            self.packages.setdefault(serial, set()).update(new_packages)
+        logger.info(f"Detected newly installed packages: {sorted(new_packages)}")
+        if app_package in new_packages:
+            return app_package
+        return sorted(new_packages)[0]
+
+    def forget(self, package, serial=None):
+        """Drop a package from the cache, e.g. after it was uninstalled."""
+        with self.lock:
+            self.packages.get(serial, set()).discard(package)
+
+    def invalidate(self, serial=None):
+        """Force the next lookup for a device to reload the full list."""
+        with self.lock:
+            self.loaded_at.pop(serial, None)
+
+
+class LaunchCache:
+    """
+    Memo of the launch method that last worked for each package, so repeat
+    launches go straight to the known component.
+    """
+
+    def __init__(self):
+        self.entries = {}  # (serial, package) -> (method, target)
+        self.lock = threading.Lock()
+
+    def get(self, package, serial=None):
+        with self.lock:
+            return self.entries.get((serial, package))
+
+    def remember(self, package, method, target, serial=None):
+        with self.lock:
+            self.entries[(serial, package)] = (method, target)
+
+    def forget(self, package, serial=None):
+        with self.lock:
+            self.entries.pop((serial, package), None)
+
+    def clear(self, serial=None):
+        """Drop every memo for a device."""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == serial]:
+                del self.entries[key]
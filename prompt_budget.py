@@ -0,0 +1,260 @@
+import re
+import time
+import math
+import threading
+import logging
+from collections import deque
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+# Words, numbers and single punctuation marks; long words cost about one token per 4 characters
+PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Tokens of role and framing overhead added per chat message
+MESSAGE_OVERHEAD = 4
+TRUNCATION_MARK = " ..."
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+
+
+def _piece_tokens(piece):
+    return max(1, math.ceil(len(piece) / 4))
+
+
+def count_tokens(text):
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when it is installed. Otherwise the count is estimated
+    from words and punctuation, which is close enough for budgeting; the
+    Cohere and Llama tokenizers differ from each other anyway.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return sum(_piece_tokens(match.group()) for match in PIECE_PATTERN.finditer(text))
+
+
+def truncate_tokens(text, budget):
+    """Cut text down to about budget tokens, keeping the start."""
+    if count_tokens(text) <= budget:
+        return text
+    # Leave room for the truncation mark
+    budget -= count_tokens(TRUNCATION_MARK)
+    if budget <= 0:
+        return ""
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:budget]) + TRUNCATION_MARK
+    used = 0
+    for match in PIECE_PATTERN.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > budget:
+            return text[:match.start()].rstrip() + TRUNCATION_MARK
+    return text
+
+
+def message_text(message):
+    """Text of a chat message in either Cohere ('message') or OpenAI ('content') format."""
+    return message.get('content') or message.get('message') or ""
+
+
+def message_tokens(messages):
+    return sum(count_tokens(message_text(message)) + MESSAGE_OVERHEAD for message in messages)
+
+
+def _is_user_message(message):
+    return message.get('role', '').lower() in ('user', 'system')
+
+
+class Section:
+    """
+    One part of a prompt.
+
+    :param name: Section name used for budgets and metrics
+    :param content: Text, or a list of chat messages
+    :param priority: Higher priority sections are trimmed last
+    :param trim: 'oldest' drops messages from the front, 'tail' cuts text
+                 from the end, None never trims the section
+    """
+
+    def __init__(self, name, content, priority=0, trim=None):
+        self.name = name
+        self.content = content
+        self.priority = priority
+        self.trim = trim
+
+    @property
+    def tokens(self):
+        if isinstance(self.content, list):
+            return message_tokens(self.content)
+        return count_tokens(self.content)
+
+    def trim_to(self, budget):
+        """Trim the section to at most budget tokens, as far as its trim mode allows."""
+        if self.trim is None or self.tokens <= budget:
+            return
+        if self.trim == 'oldest':
+            messages = list(self.content)
+            while messages and message_tokens(messages) > budget:
+                messages.pop(0)
+                # Don't start the remaining history with a reply to a dropped question
+                while messages and not _is_user_message(messages[0]):
+                    messages.pop(0)
+            self.content = messages
+        elif self.trim == 'tail':
+            self.content = truncate_tokens(self.content, budget)
+
+
+class AssembledPrompt:
+    """The sections of a prompt after budgeting, with their token counts."""
+
+    def __init__(self, name, sections, original_tokens, metrics):
+        self.name = name
+        self.sections = {section.name: section.content for section in sections}
+        self.tokens = {section.name: section.tokens for section in sections}
+        self.original_tokens = original_tokens
+        self.prompt_tokens = sum(self.tokens.values())
+        self.trimmed = [name for name, tokens in self.tokens.items() if tokens < original_tokens[name]]
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.finished = False
+
+    def __getitem__(self, name):
+        return self.sections[name]
+
+    def finish(self, completion):
+        """
+        Record the request once the completion is known.
+
+        :param completion: Completion text
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if self.metrics is not None:
+            self.metrics.record(
+                self.name, self.tokens, self.original_tokens, count_tokens(completion),
+                time.perf_counter() - self.started
+            )
+
+
+class PromptBudget:
+    """
+    Assembles prompts within a token budget.
+
+    Each section can have its own cap. When the total is still over the
+    budget, trimmable sections are cut further, lowest priority first.
+    """
+
+    def __init__(self, name, total, section_budgets=None, metrics=None):
+        """
+        :param name: Prompt name used in the metrics, e.g. 'classifier'
+        :param total: Token budget for the whole prompt
+        :param section_budgets: Optional dict of section name -> token cap
+        :param metrics: PromptMetrics to record requests in
+        """
+        self.name = name
+        self.total = total
+        self.section_budgets = dict(section_budgets or {})
+        self.metrics = metrics
+
+    def assemble(self, sections):
+        """
+        :param sections: List of Section
+        :return: AssembledPrompt
+        """
+        original = {section.name: section.tokens for section in sections}
+        for section in sections:
+            budget = self.section_budgets.get(section.name)
+            if budget is not None:
+                section.trim_to(budget)
+
+        overflow = sum(section.tokens for section in sections) - self.total
+        for section in sorted(sections, key=lambda s: s.priority):
+            if overflow <= 0:
+                break
+            if section.trim is None:
+                continue
+            before = section.tokens
+            section.trim_to(max(before - overflow, 0))
+            overflow -= before - section.tokens
+
+        assembled = AssembledPrompt(self.name, sections, original, self.metrics)
+        if assembled.trimmed:
+            logger.info(
+                f"{self.name} prompt trimmed {', '.join(assembled.trimmed)}: "
+                f"{sum(original.values())} -> {assembled.prompt_tokens} tokens"
+            )
+        if overflow > 0:
+            logger.warning(f"{self.name} prompt is {overflow} tokens over its {self.total} token budget")
+        return assembled
+
+
+class PromptMetrics:
+    """Per-prompt token accounting: totals plus a window of recent requests."""
+
+    def __init__(self, window=200):
+        self.recent = deque(maxlen=window)
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, section_tokens, original_tokens, completion_tokens, elapsed):
+        prompt_tokens = sum(section_tokens.values())
+        entry = {
+            'prompt': name,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'trimmed_tokens': sum(original_tokens.values()) - prompt_tokens,
+            'sections': dict(section_tokens),
+            'elapsed': elapsed,
+        }
+        with self.lock:
+            self.recent.append(entry)
+            total = self.totals.setdefault(name, {
+                'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'trimmed_tokens': 0, 'sections': {},
+            })
+            total['requests'] += 1
+            total['prompt_tokens'] += prompt_tokens
+            total['completion_tokens'] += completion_tokens
+            total['trimmed_tokens'] += entry['trimmed_tokens']
+            for section, tokens in section_tokens.items():
+                total['sections'][section] = total['sections'].get(section, 0) + tokens
+
+    def stats(self):
+        """
+        :return: Dict of prompt name -> request count and average tokens per
+                 request, overall and per section
+        """
+        with self.lock:
+            stats = {}
+            for name, total in self.totals.items():
+                requests = total['requests']
+                stats[name] = {
+                    'requests': requests,
+                    'avg_prompt_tokens': total['prompt_tokens'] / requests,
+                    'avg_completion_tokens': total['completion_tokens'] / requests,
+                    'avg_trimmed_tokens': total['trimmed_tokens'] / requests,
+                    'avg_section_tokens': {
+                        section: tokens / requests for section, tokens in total['sections'].items()
+                    },
+                }
+            return stats
+
+    def recent_requests(self, limit=20):
+        with self.lock:
+            return list(self.recent)[-limit:]
+
+
+# Shared metrics for every prompt the assistant sends
+prompt_metrics = PromptMetrics()
@@ -0,0 +1,173 @@
+import os
+import subprocess
+import threading
+import queue
+import time
+import logging
+from collections import deque, namedtuple
+from datetime import datetime
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+# A captured screen: wall-clock capture time and the PNG-encoded image
+Frame = namedtuple('Frame', ['timestamp', 'png'])
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class ScreenCaptureError(Exception):
+    """Raised when a screenshot could not be read from the device."""
+
+
+def capture_png(adb_path, serial=None, timeout=10):
+    """
+    Capture the device screen straight into memory.
+
+    `adb exec-out` streams the raw `screencap` output over stdout, so there is
+    no temporary file on the device and no second `adb pull`.
+
+    :param adb_path: Path to the adb executable
+    :param serial: Device serial, or None for the only attached device
+    :param timeout: Seconds to wait for the capture
+    :return: PNG image bytes
+    """
+    cmd = [adb_path]
+    if serial:
+        cmd += ['-s', serial]
+    cmd += ['exec-out', 'screencap', '-p']
+    result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    if result.returncode != 0 or not result.stdout.startswith(PNG_SIGNATURE):
+        error = result.stderr.decode('utf-8', errors='replace').strip()
+        raise ScreenCaptureError(f"screencap failed (exit code {result.returncode}): {error}")
+    return result.stdout
+
+
+class FrameBuffer:
+    """
+    Thread-safe ring buffer holding the most recent frames.
+    """
+
+    def __init__(self, size=10):
+        self.frames = deque(maxlen=size)
+        self.condition = threading.Condition()
+
+    def append(self, frame):
+        with self.condition:
+            self.frames.append(frame)
+            self.condition.notify_all()
+
+    def latest(self):
+        """Return the newest frame, or None if nothing was captured yet."""
+        with self.condition:
+            return self.frames[-1] if self.frames else None
+
+    def snapshot(self):
+        """Return all buffered frames, oldest first."""
+        with self.condition:
+            return list(self.frames)
+
+    def wait_for_frame(self, newer_than=0.0, timeout=None):
+        """
+        Block until a frame captured after `newer_than` is available.
+
+        :return: The frame, or None on timeout
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.frames and self.frames[-1].timestamp > newer_than,
+                timeout=timeout
+            )
+            if self.frames and self.frames[-1].timestamp > newer_than:
+                return self.frames[-1]
+            return None
+
+
+class DiskSink:
+    """
+    Writes frames to disk on a background thread so capture never waits on
+    file I/O. Frames are dropped if the writer falls too far behind.
+    """
+
+    def __init__(self, directory, max_pending=20):
+        self.directory = directory
+        self.pending = queue.Queue(maxsize=max_pending)
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def path_for(self, frame):
+        # Include milliseconds so streamed frames don't overwrite each other
+        timestamp = datetime.fromtimestamp(frame.timestamp).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        return os.path.join(self.directory, f'screenshot_{timestamp}.png')
+
+    def submit(self, frame, path=None):
+        """
+        Queue a frame for writing.
+
+        :return: Path the frame will be written to, or None if it was dropped
+        """
+        path = path or self.path_for(frame)
+        try:
+            self.pending.put_nowait((frame, path))
+        except queue.Full:
+            logger.warning("Screenshot writer is behind, dropping frame")
+            return None
+        return path
+
+    def _write_loop(self):
+        while True:
+            frame, path = self.pending.get()
+            try:
+                # Write to a temporary name first so readers never see a partial file
+                temp_path = path + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(frame.png)
+                os.replace(temp_path, path)
+            except Exception as e:
+                logger.error(f"Failed to save screenshot {path}: {e}")
+            finally:
+                self.pending.task_done()
+
+
+class ScreenStreamer:
+    """
+    Continuously captures the screen at a fixed rate into a FrameBuffer,
+    optionally forwarding every frame to a sink.
+    """
+
+    def __init__(self, adb_path, serial=None, fps=1.0, buffer_size=10, sink=None):
+        self.adb_path = adb_path
+        self.serial = serial
+        self.interval = 1.0 / fps
+        self.buffer = FrameBuffer(buffer_size)
+        self.sink = sink
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+        logger.info(f"Screen streaming started at {1.0 / self.interval:.1f} fps")
+
+    def stop(self):
+        self.stopped.set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _capture_loop(self):
+        while not self.stopped.is_set():
+            started = time.monotonic()
+            try:
+                frame = Frame(time.time(), capture_png(self.adb_path, self.serial))
+                self.buffer.append(frame)
+                if self.sink:
+                    self.sink.submit(frame)
+            except Exception as e:
+                logger.error(f"Screen capture error: {e}")
+            # Keep a steady rate regardless of how long the capture took
+            self.stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,184 @@
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+from googlesearch import search as google_search
+
+from dmm_cache import cache_key
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+SearchResult = namedtuple('SearchResult', ['title', 'description', 'url'], defaults=[""])
+
+# Seconds a cached search stays fresh, per query class
+DEFAULT_TTLS = {
+    'volatile': 10 * 60,        # weather, news, scores, prices: changes within the hour
+    'realtime': 30 * 60,
+    'google search': 60 * 60,
+    'youtube search': 6 * 60 * 60,
+    'general': 24 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+# Queries about these go stale quickly whatever the classifier called them
+VOLATILE_PATTERN = re.compile(
+    r"\b(weather|forecast|temperature|rain|news|headlines?|score|scores|live|stock|stocks|price|prices|"
+    r"rate|rates|today|tonight|now|current|latest)\b"
+)
+
+
+def query_class(query, category=None):
+    """
+    Pick the TTL class for a search.
+
+    :param query: Search query
+    :param category: Classifier category, e.g. 'realtime' or 'google search'
+    :return: A key of the TTL table
+    """
+    if VOLATILE_PATTERN.search(cache_key(query)):
+        return 'volatile'
+    return category or 'default'
+
+
+class SearchBackend:
+    """Interface for the web search behind SearchCache."""
+
+    def search(self, query, num_results):
+        """
+        :return: List of SearchResult
+        """
+        raise NotImplementedError
+
+
+class GoogleSearchBackend(SearchBackend):
+    """Web search through the googlesearch package."""
+
+    def search(self, query, num_results):
+        return [
+            SearchResult(result.title, result.description, getattr(result, 'url', ""))
+            for result in google_search(query, advanced=True, num_results=num_results)
+        ]
+
+
+class StaticSearchBackend(SearchBackend):
+    """
+    Local stand-in that serves canned results, for tests and offline runs.
+    Queries are matched on their normalized form; unknown queries return
+    no results.
+    """
+
+    def __init__(self, results=None, delay=0.0):
+        """
+        :param results: Dict of query -> list of SearchResult or (title, description) tuples
+        :param delay: Seconds each search takes, to simulate the network
+        """
+        self.results = {
+            cache_key(query): [r if isinstance(r, SearchResult) else SearchResult(*r) for r in items]
+            for query, items in (results or {}).items()
+        }
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query, num_results):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.results.get(cache_key(query), [])[:num_results]
+
+
+class SearchCache:
+    """
+    LRU + TTL cache of web search results keyed on the normalized query.
+
+    Concurrent lookups of the same query share one search: the first
+    caller runs it and the rest wait for its result. Failed or empty
+    searches are not cached.
+    """
+
+    def __init__(self, backend=None, max_entries=256, ttls=None, default_ttl=DEFAULT_TTL):
+        """
+        :param backend: SearchBackend, GoogleSearchBackend by default
+        :param max_entries: Queries kept in memory
+        :param ttls: Dict of query class -> seconds, merged over DEFAULT_TTLS
+        :param default_ttl: Seconds for classes not in the table
+        """
+        self.backend = backend or GoogleSearchBackend()
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()  # (key, num_results) -> (results, expires_at)
+        self.in_flight = {}  # (key, num_results) -> Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.lock = threading.Lock()
+
+    def ttl(self, query, category=None):
+        return self.ttls.get(query_class(query, category), self.default_ttl)
+
+    def search(self, query, category=None, num_results=5):
+        """
+        :param query: Search query
+        :param category: Classifier category, used to pick the TTL
+        :param num_results: Results to fetch
+        :return: List of SearchResult
+        """
+        key = (cache_key(query), num_results)
+        now = time.time()
+        leader = False
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self.entries[key]
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self.in_flight[key] = Future()
+                leader = True
+        if not leader:
+            return future.result()
+
+        try:
+            results = self.backend.search(query, num_results)
+        except Exception as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            if results:
+                self.entries[key] = (results, time.time() + self.ttl(query, category))
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        future.set_result(results)
+        return results
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        :return: Dict with hits, misses, coalesced lookups, hit_rate and size
+        """
+        with self.lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': (self.hits + self.coalesced) / total if total else 0.0,
+                'size': len(self.entries),
+            }
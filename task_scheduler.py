@@ -0,0 +1,214 @@
+import time
+import threading
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from device_fleet import DeviceNotFoundError
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+# Categories that change the phone's state and must run in order on one device
+DEVICE_CATEGORIES = {'open', 'close', 'play', 'system'}
+# Categories answered by an LLM, which can run as coroutines instead of on a thread
+LLM_CATEGORIES = {'general', 'realtime', 'google search', 'youtube search'}
+# Categories that run only after every other task of the utterance has finished
+FINAL_CATEGORIES = {'exit'}
+
+# elapsed is the time the task itself took to run, in seconds
+TaskResult = namedtuple('TaskResult', ['command', 'result', 'error', 'elapsed'])
+
+
+def is_device_task(command):
+    return command.category_type in DEVICE_CATEGORIES
+
+
+def aggregate_results(results):
+    """
+    Combine the results of one utterance into a single response.
+
+    :param results: List of TaskResult
+    :return: The result itself for a single task, None when no task was
+             produced, otherwise a list of dicts with the task, its result
+             and any error
+    """
+    if not results:
+        return None
+    if len(results) == 1:
+        return results[0].result
+    return [
+        {
+            'task': f"{r.command.category_type} {r.command.query}".strip(),
+            'result': r.result,
+            'error': r.error,
+        }
+        for r in results
+    ]
+
+
+class TaskScheduler:
+    """
+    Runs every task of an utterance, concurrently where it is safe.
+
+    Device tasks go to the fleet worker of one phone, so they keep their
+    order; everything else (LLM answers, searches) runs on a thread pool
+    alongside them. A compound request therefore takes about as long as its
+    slowest task instead of the sum of all of them. When an async executor
+    is given, LLM tasks run as coroutines on the runner's event loop and
+    don't hold a thread while the model generates.
+    """
+
+    def __init__(self, fleet, execute, max_workers=4, execute_async=None, runner=None):
+        """
+        :param fleet: DeviceFleet that runs device tasks
+        :param execute: Callable ClassifiedCommand -> result
+        :param max_workers: Threads for tasks that don't touch the device
+        :param execute_async: Optional coroutine function ClassifiedCommand -> result for LLM tasks
+        :param runner: Object whose submit(coroutine) returns a Future, e.g. AsyncLLMClients
+        """
+        self.fleet = fleet
+        self.execute = execute
+        self.execute_async = execute_async if runner is not None else None
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task')
+        # Coordinators wait on task futures, so they get their own threads
+        self.coordinators = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task-coordinator')
+        # Final tasks wait for everything started before them, one at a time
+        self.finalizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='task-final')
+        self.outstanding = set()  # Futures of tasks started with submit_task or submit
+        self.lock = threading.Lock()
+
+    def pin(self, commands, serial=None, tag=None):
+        """
+        Route all device tasks of one utterance to the same phone.
+
+        The first device task without a serial picks a device (by serial,
+        tag or load); later ones are stamped with the same serial so that
+        "open whatsapp, system take a screenshot" can't be split across
+        phones.
+
+        :param commands: Iterable of ClassifiedCommand, possibly still streaming
+        :return: Generator of ClassifiedCommand
+        """
+        pinned = False
+        chosen = None
+        for command in commands:
+            if is_device_task(command) and command.serial is None:
+                if not pinned:
+                    try:
+                        chosen = self.fleet.select(serial, command.tag or tag)
+                    except DeviceNotFoundError as e:
+                        logger.error(f"Could not pick a device for {command}: {e}")
+                    pinned = True
+                if chosen is None:
+                    # Let the fleet route (or reject) each task itself
+                    command = command._replace(serial=serial, tag=command.tag or tag)
+                else:
+                    command = command._replace(serial=chosen, tag=None)
+            yield command
+
+    def submit_task(self, command):
+        """
+        Start a single task.
+
+        A final task such as 'exit' only runs once every task submitted
+        before it has finished, so tasks queued one by one from the same
+        utterance keep the ordering run() gives them.
+
+        :return: Future with the task result
+        """
+        if command.category_type in FINAL_CATEGORIES:
+            with self.lock:
+                earlier = list(self.outstanding)
+            return self.finalizer.submit(self._run_final, command, earlier)
+        return self._track(self._start(command))
+
+    def _track(self, future):
+        with self.lock:
+            self.outstanding.add(future)
+        future.add_done_callback(self._untrack)
+        return future
+
+    def _untrack(self, future):
+        with self.lock:
+            self.outstanding.discard(future)
+
+    def _run_final(self, command, earlier):
+        if earlier:
+            logger.info(f"Holding {command.category_type} until {len(earlier)} earlier tasks finish")
+            wait(earlier)
+        return self.execute(command)
+
+    def _start(self, command, timed=False):
+        if self.execute_async is not None and command.category_type in LLM_CATEGORIES:
+            return self.runner.submit(self._run_async(command, timed))
+        func = self._timed if timed else self.execute
+        if is_device_task(command):
+            return self.fleet.submit(func, command, serial=command.serial, tag=command.tag)
+        return self.executor.submit(func, command)
+
+    def _timed(self, command):
+        started = time.perf_counter()
+        return self.execute(command), time.perf_counter() - started
+
+    async def _run_async(self, command, timed):
+        started = time.perf_counter()
+        result = await self.execute_async(command)
+        return (result, time.perf_counter() - started) if timed else result
+
+    def run(self, commands, serial=None, tag=None):
+        """
+        Run the tasks of one utterance and wait for all of them.
+
+        Tasks are started as soon as they are yielded, so this overlaps with
+        a classifier that is still streaming.
+
+        :param commands: Iterable of ClassifiedCommand
+        :param serial: Device for tasks that don't name one
+        :param tag: Device tag for tasks that don't name a device
+        :return: List of TaskResult in the order the tasks were classified
+        """
+        started = time.perf_counter()
+        running = []
+        final = []
+        for command in self.pin(commands, serial, tag):
+            if command.category_type in FINAL_CATEGORIES:
+                final.append(command)
+                continue
+            try:
+                running.append((command, self._start(command, timed=True)))
+            except DeviceNotFoundError as e:
+                logger.error(f"Could not route task {command}: {e}")
+                running.append((command, e))
+            logger.info(f"Scheduled task {command.category_type} {command.query}")
+
+        results = [self._collect(command, future) for command, future in running]
+        for command in final:
+            results.append(self._collect(command, self.executor.submit(self._timed, command)))
+        logger.info(f"Ran {len(results)} tasks in {time.perf_counter() - started:.2f}s")
+        return results
+
+    def submit(self, commands, serial=None, tag=None):
+        """
+        Run the tasks of one utterance in the background.
+
+        :return: Future with the aggregated response (see aggregate_results)
+        """
+        return self._track(self.coordinators.submit(lambda: aggregate_results(self.run(commands, serial, tag))))
+
+    @staticmethod
+    def _collect(command, future):
+        if isinstance(future, Exception):
+            return TaskResult(command, None, str(future), 0.0)
+        try:
+            result, elapsed = future.result()
+            return TaskResult(command, result, None, elapsed)
+        except Exception as e:
+            logger.error(f"Task {command.category_type} {command.query} failed: {e}")
+            return TaskResult(command, None, str(e), 0.0)
+
+    def shutdown(self):
+        self.coordinators.shutdown(wait=False)
+        self.finalizer.shutdown(wait=False)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+import fake_adb
+from adb_shell import AdbShellSession, AdbShellError, AdbShellTimeout
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason="fake adb needs /bin/sh")
+
+
+@pytest.fixture
+def session(tmp_path):
+    launcher = fake_adb.write_launcher(str(tmp_path), {'spawn_latency': 0, 'latency': {'default': 0}})
+    session = AdbShellSession(launcher, timeout=10)
+    session.start()
+    yield session
+    session.close()
+
+
+def test_returns_output_and_exit_status(session):
+    assert session.run("echo hello") == (0, "hello\n")
+    returncode, output = session.run("echo oops; exit_status() { return 3; }; exit_status")
+    assert returncode == 3
+    assert output == "oops\n"
+
+
+def test_output_without_trailing_newline(session):
+    assert session.run("printf abc") == (0, "abc")
+
+
+def test_multi_line_output_and_stderr(session):
+    returncode, output = session.run("echo one; echo two 1>&2; echo three")
+    assert returncode == 0
+    assert output.splitlines() == ["one", "two", "three"]
+
+
+def test_command_cannot_swallow_the_next_one(session):
+    # cat reads stdin; it must not eat the sentinel or the commands after it
+    assert session.run("cat") == (0, "")
+    assert session.run("echo still here") == (0, "still here\n")
+
+
+def test_commands_reach_the_device_stubs(session):
+    returncode, output = session.run("pm list packages")
+    assert returncode == 0
+    assert "package:com.android.chrome" in output
+
+
+def test_health_check(session):
+    assert session.health_check()
+
+
+def test_timeout_closes_the_session(session):
+    with pytest.raises(AdbShellTimeout):
+        session.run("sleep 5", timeout=0.3)
+    assert not session.is_alive()
+    with pytest.raises(AdbShellError):
+        session.run("echo hello")
@@ -0,0 +1,59 @@
+import json
+
+from conversation_store import ConversationStore
+
+
+def read_messages(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_messages_survive_a_restart(tmp_path):
+    path = str(tmp_path / "chat.jsonl")
+    store = ConversationStore(path)
+    store.append_turn("hi", "hello")
+    store.close()
+    assert ConversationStore(path).messages() == [
+        {"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}
+    ]
+
+
+def test_torn_line_is_skipped_and_terminated(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    path.write_text('{"role": "user", "content": "hi"}\n{"role": "assis', encoding='utf-8')
+    store = ConversationStore(str(path))
+    assert store.messages() == [{"role": "user", "content": "hi"}]
+    store.append({"role": "user", "content": "again"})
+    store.close()
+    assert ConversationStore(str(path)).messages()[-1] == {"role": "user", "content": "again"}
+
+
+def test_rotation_and_compaction(tmp_path):
+    path = str(tmp_path / "chat.jsonl")
+    store = ConversationStore(path, tail_size=10, max_bytes=200, keep_segments=2)
+    for i in range(30):
+        store.append_turn(f"question {i}", f"answer {i}")
+    if store.compaction_thread is not None:
+        store.compaction_thread.join(5)
+    store.compact()
+    store.close()
+
+    assert len(store.segments()) <= 2
+    archived = read_messages(store.archive_path)
+    kept = [m for segment in store.segments() for m in read_messages(segment)] + read_messages(path)
+    # Nothing is lost or duplicated, and order is kept
+    assert [m['content'] for m in archived + kept] == [
+        text for i in range(30) for text in (f"question {i}", f"answer {i}")
+    ]
+    # The in-memory tail is rebuilt across the archive, segments and active file
+    reopened = ConversationStore(path, tail_size=10, max_bytes=200, keep_segments=2)
+    assert [m['content'] for m in reopened.messages()] == [
+        text for i in range(25, 30) for text in (f"question {i}", f"answer {i}")
+    ]
+
+
+def test_migrates_legacy_log(tmp_path):
+    legacy = tmp_path / "ChatLog.json"
+    legacy.write_text(json.dumps([{"role": "user", "content": "old"}]), encoding='utf-8')
+    store = ConversationStore(str(tmp_path / "chat.jsonl"), legacy_paths=[str(legacy)])
+    assert store.messages() == [{"role": "user", "content": "old"}]
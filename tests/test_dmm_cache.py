@@ -0,0 +1,36 @@
+import pytest
+
+from dmm_cache import ClassificationCache, cache_key
+
+
+@pytest.mark.parametrize("utterance, key", [
+    ("Open Chrome!", "open chrome"),
+    ("  open   chrome  ", "open chrome"),
+    ("um, open chrome please", "open chrome"),
+    ("Hey Jarvis, what time is it?", "what time is it"),
+    ("would you like pizza", "would you like pizza"),
+    ("can you open youtube", "can you open youtube"),
+    ("play hey jude", "play hey jude"),
+    ("what's up", "what's up"),
+])
+def test_cache_key(utterance, key):
+    assert cache_key(utterance) == key
+
+
+def test_meaningful_lead_ins_keep_keys_apart():
+    assert cache_key("would you like pizza") != cache_key("like pizza")
+    assert cache_key("just open chrome") != cache_key("open chrome")
+
+
+def test_cache_hits_on_normalized_utterance():
+    cache = ClassificationCache()
+    cache.put("Open Chrome, please", ["open chrome"])
+    assert cache.get("open chrome") == ["open chrome"]
+    assert cache.get("would you open chrome") is None
+
+
+def test_cache_persists(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ClassificationCache(path=path)
+    cache.put("open chrome", ["open chrome"])
+    assert ClassificationCache(path=path).get("Open chrome.") == ["open chrome"]
@@ -0,0 +1,61 @@
+import pytest
+
+from fast_intent import FastIntentClassifier, normalize_utterance
+
+APPS = ["chrome", "firefox", "youtube", "whatsapp", "maps", "google maps", "settings"]
+
+
+@pytest.fixture
+def classifier():
+    return FastIntentClassifier(APPS)
+
+
+@pytest.mark.parametrize("utterance, tasks", [
+    ("open chrome", ["open chrome"]),
+    ("Open the YouTube app", ["open youtube"]),
+    ("can you open youtube please", ["open youtube"]),
+    ("hey jarvis, open youtube for me", ["open youtube"]),
+    ("open chrome and firefox", ["open chrome", "open firefox"]),
+    ("close whatsapp now", ["close whatsapp"]),
+    ("open google maps", ["open google maps"]),
+    ("turn the volume up", ["system volume up"]),
+    ("take a screenshot", ["system take a screenshot"]),
+    ("bye", ["exit"]),
+    ("play the song bohemian rhapsody", ["play bohemian rhapsody"]),
+    ("search cats on youtube", ["youtube search cats"]),
+    ("google search python tutorials", ["google search python tutorials"]),
+])
+def test_accepted(classifier, utterance, tasks):
+    assert classifier.classify(utterance) == tasks
+
+
+@pytest.mark.parametrize("utterance", [
+    "start over",
+    "start the timer",
+    "launch a rocket",
+    "kill me",
+    "exit the app",
+    "open tom and jerry",
+    "open the pod bay doors",
+    "google maps",
+    "play the game with me",
+    "what is the weather today",
+    "open chrome and tell me a joke",
+])
+def test_rejected(classifier, utterance):
+    assert classifier.classify(utterance) is None
+
+
+def test_open_needs_known_apps():
+    assert FastIntentClassifier().classify("open chrome") is None
+
+
+def test_stats(classifier):
+    classifier.classify("open chrome")
+    classifier.classify("start over")
+    stats = classifier.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+
+def test_normalize_utterance():
+    assert normalize_utterance("  Could you, PLEASE open Chrome now?! ") == "open chrome"
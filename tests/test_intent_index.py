@@ -0,0 +1,48 @@
+import pytest
+
+from intent_index import IntentIndex
+
+
+@pytest.fixture
+def index():
+    index = IntentIndex(threshold=0.85)
+    index.add("bye", ["exit"])
+    index.add("tell me a joke", ["general tell me a joke"])
+    index.add("what is the weather in pune", ["realtime what is the weather in pune"])
+    index.add("who is the prime minister of india", ["general who is the prime minister of india"])
+    return index
+
+
+def test_exact_utterance_matches(index):
+    tasks, score = index.classify_batch(["Tell me a joke!"])[0]
+    assert tasks == ["general tell me a joke"]
+    assert score == pytest.approx(1.0)
+
+
+def test_unseen_words_lower_the_score(index):
+    # Words the index has never seen used to be dropped, so these matched at 1.0
+    for utterance in ["send bye to mom on whatsapp", "tell me a joke about cats"]:
+        tasks, score = index.classify_batch([utterance])[0]
+        assert tasks is None
+        assert score < index.threshold
+
+
+def test_close_paraphrase_still_matches(index):
+    tasks, score = index.classify_batch(["who is the prime minister of india now"])[0]
+    assert tasks == ["general who is the prime minister of india"]
+    assert index.threshold <= score < 1.0
+
+
+def test_batch_matches_single_lookups(index):
+    utterances = ["bye", "tell me a joke", "open the pod bay doors"]
+    assert index.classify_batch(utterances) == [index.classify_batch([u])[0] for u in utterances]
+
+
+def test_empty_index_misses():
+    assert IntentIndex().classify_batch(["hello"]) == [(None, 0.0)]
+
+
+def test_relearning_replaces_the_label(index):
+    index.add("tell me a joke", ["general tell me a funny joke"])
+    assert index.classify_batch(["tell me a joke"])[0][0] == ["general tell me a funny joke"]
+    assert len(index) == 4
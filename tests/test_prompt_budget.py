@@ -0,0 +1,64 @@
+from prompt_budget import PromptBudget, PromptMetrics, Section, count_tokens, truncate_tokens
+
+
+def history(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"question number {i} " * 5})
+        messages.append({"role": "assistant", "content": f"answer number {i} " * 5})
+    return messages
+
+
+def test_truncate_tokens_stays_within_budget():
+    text = "word " * 200
+    truncated = truncate_tokens(text, 20)
+    assert count_tokens(truncated) <= 20
+    assert truncated.endswith("...")
+    assert truncate_tokens("short", 20) == "short"
+
+
+def test_oldest_trim_drops_whole_turns():
+    section = Section('history', history(10), trim='oldest')
+    section.trim_to(section.tokens // 2)
+    assert section.content
+    assert section.content[0]['role'] == 'user'
+    assert section.content[-1] == history(10)[-1]
+
+
+def test_section_caps_apply_first():
+    budget = PromptBudget('test', total=10000, section_budgets={'search': 10})
+    prompt = budget.assemble([
+        Section('system', "You are a helpful assistant."),
+        Section('search', "result " * 100, trim='tail'),
+    ])
+    assert prompt.tokens['search'] <= 10
+    assert prompt.trimmed == ['search']
+
+
+def test_lowest_priority_is_trimmed_first():
+    system = "You are a helpful assistant. " * 5
+    budget = PromptBudget('test', total=count_tokens(system) + 60)
+    prompt = budget.assemble([
+        Section('system', system, priority=3),
+        Section('history', history(10), priority=1, trim='oldest'),
+        Section('search', "result " * 30, priority=2, trim='tail'),
+    ])
+    assert prompt['system'] == system
+    assert prompt.tokens['search'] == count_tokens("result " * 30)
+    assert prompt.prompt_tokens <= budget.total
+    assert 'history' in prompt.trimmed
+
+
+def test_untrimmable_sections_are_left_alone():
+    budget = PromptBudget('test', total=5)
+    prompt = budget.assemble([Section('system', "word " * 50)])
+    assert prompt.tokens['system'] == count_tokens("word " * 50)
+    assert prompt.trimmed == []
+
+
+def test_metrics_record_finished_prompts():
+    metrics = PromptMetrics()
+    prompt = PromptBudget('test', total=100, metrics=metrics).assemble([Section('system', "hello")])
+    prompt.finish("hi there")
+    prompt.finish("ignored")
+    assert metrics.stats()['test']['requests'] == 1
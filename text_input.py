@@ -0,0 +1,202 @@
+import base64
+import shlex
+import threading
+import time
+import logging
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+# ADBKeyBoard IME: accepts base64 text over a broadcast, so any Unicode works
+ADB_KEYBOARD_IME = 'com.android.adbkeyboard/.AdbIME'
+# Clipper: sets the device clipboard from a broadcast
+CLIPPER_PACKAGE = 'ca.zgrs.clipper'
+KEYCODE_PASTE = 279
+
+# `input text` fails on very long arguments, so longer text is split up
+INPUT_TEXT_CHUNK_SIZE = 100
+
+# Fastest first; the first mode that works is remembered per device
+TEXT_ENTRY_MODES = ['adb_keyboard', 'clipboard', 'input_text', 'per_char']
+
+# Echoed after each chunk is typed, so a failed script reports how far it got
+TYPED_MARKER = '__typed__'
+# Echoed instead of broadcasting when ADBKeyBoard is no longer the default IME
+IME_CHANGED_MARKER = '__ime_changed__'
+
+
+def escape_input_text(text):
+    """
+    Quote text for `input text`, which reads "%s" as a space.
+
+    :param text: Text to type
+    :return: Shell-safe argument
+    """
+    return shlex.quote(text.replace(' ', '%s'))
+
+
+def text_chunks(text, chunk_size=INPUT_TEXT_CHUNK_SIZE):
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def input_text_script(chunks):
+    """
+    Build one script that types the chunks with `input text`, echoing
+    TYPED_MARKER after each one. The script stops at the first failure.
+    """
+    return " && ".join(f"input text {escape_input_text(chunk)} && echo {TYPED_MARKER}" for chunk in chunks)
+
+
+def typed_chunks(output):
+    """
+    Count the chunks a script reported as typed before anything failed.
+    """
+    failure = output.find('Exception')
+    return output[:failure if failure >= 0 else len(output)].count(TYPED_MARKER)
+
+
+def adb_keyboard_command(text):
+    """
+    Build one script that broadcasts the text to ADBKeyBoard, but only while
+    it is still the default IME: otherwise nothing receives the broadcast and
+    it would still report success.
+    """
+    encoded = base64.b64encode(text.encode('utf-8')).decode('ascii')
+    return (
+        f'if [ "$(settings get secure default_input_method)" = {shlex.quote(ADB_KEYBOARD_IME)} ]; '
+        f'then am broadcast -a ADB_INPUT_B64 --es msg {encoded}; else echo {IME_CHANGED_MARKER}; fi'
+    )
+
+
+def clipboard_script(text):
+    return f"am broadcast -a clipper.set -e text {shlex.quote(text)} && input keyevent {KEYCODE_PASTE}"
+
+
+class TextEntry:
+    """
+    Picks the fastest working text entry mode per device and remembers it.
+
+    Modes, fastest first:
+      adb_keyboard - one broadcast to the ADBKeyBoard IME (any Unicode)
+      clipboard    - set the clipboard with Clipper, then paste (any Unicode)
+      input_text   - `input text` in escaped chunks, one shell invocation (ASCII)
+      per_char     - one `input text` per character, one shell invocation (ASCII)
+    """
+
+    def __init__(self, run_shell, is_installed):
+        """
+        :param run_shell: Callable (command, serial) -> (returncode, output)
+        :param is_installed: Callable (package, serial) -> bool
+        """
+        self.run_shell = run_shell
+        self.is_installed = is_installed
+        self.preferred_modes = {}  # serial -> mode that worked last
+        self.available = {}        # (serial, mode) -> bool
+        self.lock = threading.Lock()
+
+    def _is_available(self, mode, serial):
+        with self.lock:
+            cached = self.available.get((serial, mode))
+        if cached is not None:
+            return cached
+
+        if mode == 'adb_keyboard':
+            returncode, output = self.run_shell("settings get secure default_input_method", serial)
+            available = output.strip() == ADB_KEYBOARD_IME
+        elif mode == 'clipboard':
+            available = bool(self.is_installed(CLIPPER_PACKAGE, serial))
+        else:
+            available = True
+
+        with self.lock:
+            self.available[(serial, mode)] = available
+        return available
+
+    def candidate_modes(self, text, serial=None):
+        """
+        Return the modes to try for this text, remembered mode first.
+        """
+        ascii_only = text.isascii()
+        modes = [
+            mode for mode in TEXT_ENTRY_MODES
+            if ascii_only or mode in ('adb_keyboard', 'clipboard')
+        ]
+        with self.lock:
+            preferred = self.preferred_modes.get(serial)
+        if preferred in modes:
+            modes.remove(preferred)
+            modes.insert(0, preferred)
+        return modes
+
+    def _enter(self, mode, text, serial):
+        """
+        Type text with one mode.
+
+        :return: Number of characters typed, from the start of the text
+        """
+        if mode == 'adb_keyboard':
+            returncode, output = self.run_shell(adb_keyboard_command(text), serial)
+            if IME_CHANGED_MARKER in output:
+                logger.info("ADBKeyBoard is no longer the default input method")
+                self._forget_mode(mode, serial)
+                return 0
+            return len(text) if returncode == 0 and 'Broadcast completed' in output else 0
+        if mode == 'clipboard':
+            returncode, output = self.run_shell(clipboard_script(text), serial)
+            return len(text) if returncode == 0 and 'clipboard' in output.lower() else 0
+        if mode in ('input_text', 'per_char'):
+            # per_char types one character per `input text`, for devices that reject longer strings
+            chunks = text_chunks(text, INPUT_TEXT_CHUNK_SIZE if mode == 'input_text' else 1)
+            returncode, output = self.run_shell(input_text_script(chunks), serial)
+            return sum(len(chunk) for chunk in chunks[:typed_chunks(output)])
+        raise ValueError(f"Unknown text entry mode: {mode}")
+
+    def enter_text(self, text, serial=None):
+        """
+        Type text into the focused field.
+
+        When a mode fails part way, the next mode continues from the first
+        character that wasn't typed, so nothing is typed twice.
+
+        :return: Name of the mode that finished the text, or None if all failed
+        """
+        if not text:
+            return 'input_text'
+        remaining = text
+        for mode in self.candidate_modes(text, serial):
+            if not self._is_available(mode, serial):
+                continue
+            started = time.monotonic()
+            try:
+                typed = self._enter(mode, remaining, serial)
+            except Exception as e:
+                logger.error(f"Text entry with {mode} failed: {e}")
+                typed = 0
+            if typed == len(remaining):
+                logger.info(f"Entered {len(remaining)} characters with {mode} in {time.monotonic() - started:.2f}s")
+                with self.lock:
+                    self.preferred_modes[serial] = mode
+                return mode
+            if typed:
+                logger.warning(f"Text entry with {mode} stopped after {typed} of {len(remaining)} characters")
+                remaining = remaining[typed:]
+            logger.info(f"Text entry mode {mode} did not finish, trying next with {len(remaining)} characters left")
+        if remaining != text:
+            logger.warning(f"Only {len(text) - len(remaining)} of {len(text)} characters were entered")
+        if not text.isascii():
+            logger.warning("Non-ASCII text needs the ADBKeyBoard IME or Clipper installed on the device")
+        return None
+
+    def _forget_mode(self, mode, serial):
+        """Re-check a mode before its next use, and stop preferring it."""
+        with self.lock:
+            self.available.pop((serial, mode), None)
+            if self.preferred_modes.get(serial) == mode:
+                del self.preferred_modes[serial]
+
+    def forget_device(self, serial=None):
+        """Drop remembered modes and capabilities, e.g. after a disconnect."""
+        with self.lock:
+            self.preferred_modes.pop(serial, None)
+            for key in [key for key in self.available if key[0] == serial]:
+                del self.available[key]
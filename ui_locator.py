@@ -0,0 +1,179 @@
+import re
+import subprocess
+import threading
+import time
+import logging
+import xml.etree.ElementTree as ET
+
+# Logging setup
+logger = logging.getLogger(__name__)
+
+BOUNDS_PATTERN = re.compile(r'\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]')
+
+
+class UiDumpError(Exception):
+    """Raised when the view hierarchy could not be read from the device."""
+
+
+def dump_ui_hierarchy(adb_path, serial=None, timeout=15):
+    """
+    Dump the current view hierarchy straight to stdout.
+
+    Dumping to /dev/tty over `exec-out` avoids writing window_dump.xml on the
+    device and pulling it back.
+
+    :return: Hierarchy XML as a string
+    """
+    cmd = [adb_path]
+    if serial:
+        cmd += ['-s', serial]
+    cmd += ['exec-out', 'uiautomator', 'dump', '/dev/tty']
+    result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    output = result.stdout.decode('utf-8', errors='replace')
+    # The XML is followed by a "UI hierchary dumped to: /dev/tty" status line
+    start = output.find('<?xml')
+    end = output.rfind('</hierarchy>')
+    if start == -1 or end == -1:
+        raise UiDumpError(f"uiautomator dump failed: {output.strip() or result.stderr.decode('utf-8', errors='replace').strip()}")
+    return output[start:end + len('</hierarchy>')]
+
+
+class UiElement:
+    """A single node of the view hierarchy."""
+
+    def __init__(self, attributes):
+        self.resource_id = attributes.get('resource-id', '')
+        self.text = attributes.get('text', '')
+        self.content_desc = attributes.get('content-desc', '')
+        self.class_name = attributes.get('class', '')
+        self.package = attributes.get('package', '')
+        self.clickable = attributes.get('clickable') == 'true'
+        self.enabled = attributes.get('enabled') != 'false'
+        self.focused = attributes.get('focused') == 'true'
+        match = BOUNDS_PATTERN.match(attributes.get('bounds', ''))
+        self.bounds = tuple(int(value) for value in match.groups()) if match else (0, 0, 0, 0)
+
+    @property
+    def center(self):
+        x1, y1, x2, y2 = self.bounds
+        return (x1 + x2) // 2, (y1 + y2) // 2
+
+    @property
+    def is_visible(self):
+        x1, y1, x2, y2 = self.bounds
+        return x2 > x1 and y2 > y1
+
+    def __repr__(self):
+        label = self.resource_id or self.text or self.content_desc or self.class_name
+        return f"<UiElement {label!r} at {self.center}>"
+
+
+class UiTree:
+    """
+    Parsed view hierarchy indexed by resource-id, text and content-desc.
+    """
+
+    def __init__(self, xml_text):
+        self.elements = []
+        self.by_resource_id = {}
+        self.by_text = {}
+        self.by_content_desc = {}
+
+        root = ET.fromstring(xml_text)
+        for node in root.iter('node'):
+            element = UiElement(node.attrib)
+            if not element.is_visible:
+                continue
+            self.elements.append(element)
+            if element.resource_id:
+                self.by_resource_id.setdefault(element.resource_id, []).append(element)
+                # Also index the short id ("send" for "com.app:id/send")
+                short_id = element.resource_id.split('/')[-1]
+                self.by_resource_id.setdefault(short_id, []).append(element)
+            if element.text:
+                self.by_text.setdefault(element.text.strip().lower(), []).append(element)
+            if element.content_desc:
+                self.by_content_desc.setdefault(element.content_desc.strip().lower(), []).append(element)
+
+    def find_all(self, resource_id=None, text=None, content_desc=None, contains=False, clickable=None):
+        """
+        Find elements matching every given criterion.
+
+        :param resource_id: Full or short resource id
+        :param text: Visible text (case-insensitive)
+        :param content_desc: Accessibility description (case-insensitive)
+        :param contains: Match text/content_desc as substrings instead of exactly
+        :param clickable: If set, only return elements with this clickable state
+        :return: List of matching elements in document order
+        """
+        candidates = None
+
+        def narrow(matches):
+            nonlocal candidates
+            ids = {id(element) for element in matches}
+            candidates = matches if candidates is None else [e for e in candidates if id(e) in ids]
+
+        if resource_id:
+            narrow(self.by_resource_id.get(resource_id, []))
+        for value, index in ((text, self.by_text), (content_desc, self.by_content_desc)):
+            if not value:
+                continue
+            value = value.strip().lower()
+            if contains:
+                narrow([e for key, elements in index.items() if value in key for e in elements])
+            else:
+                narrow(index.get(value, []))
+
+        if candidates is None:
+            candidates = list(self.elements)
+        if clickable is not None:
+            candidates = [e for e in candidates if e.clickable == clickable]
+        return candidates
+
+    def find(self, **query):
+        """Return the first element matching the query, or None."""
+        matches = self.find_all(**query)
+        return matches[0] if matches else None
+
+
+class UiLocator:
+    """
+    Per-device cache of the parsed view hierarchy.
+
+    A cached tree is reused until the agent reports that the screen changed
+    (after a tap, key event, text input or app launch) or it is older than
+    `max_age` seconds, which covers changes the agent did not cause.
+    """
+
+    def __init__(self, fetch_hierarchy, max_age=5.0):
+        """
+        :param fetch_hierarchy: Callable serial -> hierarchy XML
+        :param max_age: Seconds before a cached tree is considered stale
+        """
+        self.fetch_hierarchy = fetch_hierarchy
+        self.max_age = max_age
+        self.trees = {}  # serial -> (fetched_at, UiTree)
+        self.lock = threading.Lock()
+
+    def tree(self, serial=None, refresh=False):
+        """Return the view hierarchy for a device, fetching it if needed."""
+        with self.lock:
+            cached = self.trees.get(serial)
+        if cached and not refresh and time.monotonic() - cached[0] <= self.max_age:
+            return cached[1]
+
+        started = time.monotonic()
+        tree = UiTree(self.fetch_hierarchy(serial))
+        logger.info(f"Loaded UI hierarchy with {len(tree.elements)} elements in {time.monotonic() - started:.2f}s")
+        with self.lock:
+            self.trees[serial] = (time.monotonic(), tree)
+        return tree
+
+    def find(self, serial=None, refresh=False, **query):
+        """Find the first element matching the query on the current screen."""
+        return self.tree(serial, refresh).find(**query)
+
+    def invalidate(self, serial=None):
+        """Drop the cached tree after the screen changed."""
+        with self.lock:
+            self.trees.pop(serial, None)